@@ -5,6 +5,9 @@ from traceback import format_exc
 from pyrogram import idle
 from Backend import __version__, db
 from Backend.helper.pinger import ping
+from Backend.helper.chunk_cache import disk_chunk_cache
+from Backend.helper.client_health import client_health
+from Backend.helper.usage import usage_aggregator
 from Backend.logger import LOGGER
 from Backend.fastapi import server
 from Backend.helper.pyro import restart_notification, setup_bot_commands
@@ -20,6 +23,10 @@ async def start_services():
         
         await db.connect()
         await asleep(1.2)
+
+        await disk_chunk_cache.load()
+        usage_aggregator.start()
+        client_health.watch_pyrogram_sleeps()
         
         await StreamBot.start()
         StreamBot.username = StreamBot.me.username
@@ -58,6 +65,9 @@ async def stop_services():
         
         await asyncio.gather(*pending_tasks, return_exceptions=True)
 
+        # the cancelled streams have published their last bytes by now
+        await usage_aggregator.stop()
+
         await StreamBot.stop()
         await Helper.stop()
 
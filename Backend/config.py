@@ -11,9 +11,27 @@ class Telegram:
 
     BASE_URL = getenv("BASE_URL", "").rstrip('/')
     PORT = int(getenv("PORT", "8000"))
+    URL_SECRET = getenv("URL_SECRET", "") or BOT_TOKEN
 
     PARALLEL = int(getenv("PARALLEL", "1"))
     PRE_FETCH = int(getenv("PRE_FETCH", "1"))
+    ADAPTIVE_PARALLEL = getenv("ADAPTIVE_PARALLEL", "true").lower() == "true"
+    MAX_PARALLEL = int(getenv("MAX_PARALLEL", "8"))
+    GLOBAL_MAX_INFLIGHT = int(getenv("GLOBAL_MAX_INFLIGHT", "64"))
+    STRIPE_CLIENTS = int(getenv("STRIPE_CLIENTS", "1"))
+    MEDIA_SESSIONS_PER_DC = int(getenv("MEDIA_SESSIONS_PER_DC", "2"))
+    MAX_STREAMS = int(getenv("MAX_STREAMS", "0"))
+    MAX_STREAMS_PER_CLIENT = int(getenv("MAX_STREAMS_PER_CLIENT", "16"))
+    STREAM_QUEUE_SIZE = int(getenv("STREAM_QUEUE_SIZE", "32"))
+    STREAM_QUEUE_TIMEOUT = float(getenv("STREAM_QUEUE_TIMEOUT", "10"))
+    STREAM_TIMELINE_SAMPLE = float(getenv("STREAM_TIMELINE_SAMPLE", "0"))
+
+    CHUNK_CACHE_MB = int(getenv("CHUNK_CACHE_MB", "256"))
+    CHUNK_CACHE_POLICY = getenv("CHUNK_CACHE_POLICY", "lru").lower()
+    DISK_CACHE_GB = float(getenv("DISK_CACHE_GB", "0"))
+    DISK_CACHE_DIR = getenv("DISK_CACHE_DIR", "chunk_cache")
+    FILE_ID_STORE = getenv("FILE_ID_STORE", "file_ids.db")
+    INDEX_PREFETCH = getenv("INDEX_PREFETCH", "true").lower() == "true"
 
     AUTH_CHANNEL = [channel.strip() for channel in (getenv("AUTH_CHANNEL") or "").split(",") if channel.strip()]
     DATABASE = [db.strip() for db in (getenv("DATABASE") or "").split(",") if db.strip()]
@@ -119,16 +119,24 @@ async def delete_tv_season(tmdb_id: int, db_index: int, season: int, _: bool = D
 async def get_workloads(_: bool = Depends(require_auth)):
     try:
         from Backend.pyrofork.bot import work_loads
+        from Backend.helper.client_health import client_health
         return {
             "loads": {
                 f"bot{c + 1}": l
                 for c, (_, l) in enumerate(
                     sorted(work_loads.items(), key=lambda x: x[1], reverse=True)
                 )
-            } if work_loads else {}
+            } if work_loads else {},
+            "clients": {
+                f"bot{index + 1}": info for index, info in client_health.snapshot().items()
+            },
+            "cooldowns": {
+                f"bot{key + 1}" if isinstance(key, int) else key: info
+                for key, info in client_health.cooldowns().items()
+            },
         }
     except Exception as e:
-        return {"loads": {}}
+        return {"loads": {}, "clients": {}, "cooldowns": {}}
 
 @app.post("/api/tokens")
 async def create_token(payload: dict, _: bool = Depends(require_auth)):
@@ -217,7 +217,9 @@ async def create_token_api(payload: dict):
         new_token = await db.add_api_token(
             token_name, 
             parse_limit(daily_limit), 
-            parse_limit(monthly_limit)
+            parse_limit(monthly_limit),
+            parse_limit(payload.get("max_mbps")),
+            int(parse_limit(payload.get("max_streams")) or 0)
         )
         return new_token
     except Exception as e:
@@ -235,10 +237,15 @@ async def update_token_limits_api(token: str, payload: dict):
             except (ValueError, TypeError, AttributeError):
                 return None
 
+        max_mbps = (parse_limit(payload["max_mbps"]) or 0) if "max_mbps" in payload else None
+        max_streams = int(parse_limit(payload["max_streams"]) or 0) if "max_streams" in payload else None
+
         result = await db.update_api_token_limits(
             token,
             parse_limit(daily_limit),
-            parse_limit(monthly_limit)
+            parse_limit(monthly_limit),
+            max_mbps,
+            max_streams
         )
         
         if result:
@@ -1,23 +1,34 @@
-import math
+import asyncio
 import secrets
 import mimetypes
 import time
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pyrogram.file_id import FileId
 
 from collections import deque
 
-from Backend import db
 from Backend.helper.encrypt import decode_string
-from Backend.helper.exceptions import InvalidHash
-from Backend.helper.custom_dl import ByteStreamer, ACTIVE_STREAMS, RECENT_STREAMS
+from Backend.helper.exceptions import InvalidHash, StreamBusy, StreamLimitExceeded
+from Backend.helper.admission import admission
+from Backend.helper.token_limits import TokenBucket, token_limiter
+from Backend.helper.usage import usage_aggregator
+from Backend.helper.token_cache import token_cache
+from Backend.helper.metrics import TTFB, metrics
+from Backend.helper.stream_timeline import stream_timelines
+from Backend.helper.custom_dl import ByteStreamer, resolve_file_id, ACTIVE_STREAMS, RECENT_STREAMS, INFLIGHT_CHUNKS, FETCH_STATS, INDEX_STATS
+from Backend.helper.chunk_cache import chunk_cache, disk_chunk_cache
+from Backend.helper.parallelism import GLOBAL_INFLIGHT
+from Backend.helper.range_planner import RangePlan
+from Backend.helper.client_health import client_health
+from Backend.helper.file_id_store import file_id_store
+from Backend.helper.signed_url import sign_stream_query, verify_stream_query
 from Backend.pyrofork.bot import StreamBot, work_loads, multi_clients, client_dc_map
 from Backend.config import Telegram
 from Backend.logger import LOGGER
 from Backend.fastapi.security.tokens import verify_token
-import asyncio
 
 router = APIRouter(tags=["Streaming"])
 
@@ -38,130 +49,271 @@ def make_json_safe(obj):
     return obj
 
 
-def parse_range_header(range_header: str, file_size: int):
+MAX_RANGES = 16
+
+
+def range_not_satisfiable(file_size: int, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail=detail,
+        headers={"Content-Range": f"bytes */{file_size}"},
+    )
+
+
+def parse_range_header(range_header: str, file_size: int) -> List[Tuple[int, int]]:
+    # RFC 7233 byte ranges: "a-b", "a-" and suffix "-n", comma separated; [] means the whole file
     if not range_header:
-        return 0, file_size - 1
+        return []
 
+    unit, _, value = range_header.partition("=")
+    if unit.strip().lower() != "bytes":
+        # unknown range units must be ignored
+        return []
+
+    ranges = []
     try:
-        value = range_header.replace("bytes=", "")
-        start_str, end_str = value.split("-")
-        start = int(start_str)
-        end = int(end_str) if end_str else file_size - 1
-    except Exception:
-        raise HTTPException(
-            status_code=416,
-            detail="Invalid Range header",
-            headers={"Content-Range": f"bytes */{file_size}"},
-        )
+        for spec in value.split(","):
+            spec = spec.strip()
+            if not spec:
+                continue
+            start_str, sep, end_str = spec.partition("-")
+            if not sep:
+                raise ValueError(spec)
+
+            if not start_str.strip():
+                suffix = int(end_str)
+                if suffix <= 0:
+                    continue
+                start, end = max(0, file_size - suffix), file_size - 1
+            else:
+                start = int(start_str)
+                end = int(end_str) if end_str.strip() else file_size - 1
+                if start < 0 or end < start:
+                    raise ValueError(spec)
+                if start >= file_size:
+                    continue
+                end = min(end, file_size - 1)
+            ranges.append((start, end))
+    except ValueError:
+        raise range_not_satisfiable(file_size, "Invalid Range header")
+
+    if not ranges:
+        raise range_not_satisfiable(file_size, "Requested Range Not Satisfiable")
+
+    # overlapping or touching ranges are served once
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_RANGES:
+        raise range_not_satisfiable(file_size, "Too many ranges")
+    return merged
+
+
+def stream_etag(unique_prefix: str, file_size: int) -> str:
+    return f'"{unique_prefix}-{file_size}"'
+
+
+def requested_ranges(request: Request, file_size: int, etag: str) -> List[Tuple[int, int]]:
+    range_header = request.headers.get("Range", "")
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range and if_range.strip() != etag:
+        # the client's copy changed (dates never match, there is no Last-Modified), send everything
+        return []
+    return parse_range_header(range_header, file_size)
 
-    if start < 0 or end >= file_size or end < start:
-        raise HTTPException(
-            status_code=416,
-            detail="Requested Range Not Satisfiable",
-            headers={"Content-Range": f"bytes */{file_size}"},
-        )
 
-    return start, end
+def select_best_client(target_dc: int, allowed: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+    if not multi_clients:
+        return 0
+
+    candidates = [index for index in multi_clients if allowed is None or allowed(index)]
+    if not candidates:
+        return None
+
+    # clients sleeping off a FloodWait only get new streams when every client is
+    now = time.time()
+    ready = [index for index in candidates if not client_health.in_cooldown(index, now)]
+    scores = {index: client_health.score(index, target_dc, now) for index in ready or candidates}
+    selected = min(scores, key=lambda index: scores[index]["score"])
+    LOGGER.debug(
+        f"Selected client {selected} (DC {client_dc_map.get(selected, 'unknown')}) "
+        f"for DC {target_dc}: {scores[selected]}"
+    )
+    return selected
 
 
-def select_best_client(target_dc: int) -> int:
-    matching_dc_clients = []
-    for client_idx, client_dc in client_dc_map.items():
-        if client_dc == target_dc and client_idx in multi_clients:
-            matching_dc_clients.append((client_idx, work_loads.get(client_idx, 0)))
+class AdmittedStreamingResponse(StreamingResponse):
+    # gives the admission slot back however the response ends, even if the body never started
+    def __init__(self, *args, client_index: int, token: str, started: Optional[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client_index = client_index
+        self.token = token
+        self.started = started
 
+    async def __call__(self, scope, receive, send):
+        first_byte = self.started is not None
 
-    # # -------------Don't use part of code at now ----------------------------
-    # if matching_dc_clients:
-    #     selected = min(matching_dc_clients, key=lambda x: x[1])[0]
-    #     LOGGER.info(
-    #         f"Selected client {selected} (DC {target_dc} match) with workload {work_loads[selected]}"
-    #     )
-    #     return selected
-    # # -------------------------------------------------------------------------
+        async def timed_send(message):
+            nonlocal first_byte
+            if first_byte and message["type"] == "http.response.body" and message.get("body"):
+                first_byte = False
+                TTFB.observe(time.monotonic() - self.started)
+            await send(message)
 
-    if multi_clients:
-        selected = min(work_loads, key=work_loads.get)
-        selected_dc = client_dc_map.get(selected, "unknown")
-        LOGGER.debug(
-            f"No DC {target_dc} client available. "
-            f"Using client {selected} (DC {selected_dc}) with workload {work_loads[selected]}"
-        )
-        return selected
-
-    return 0
-
-
-async def track_usage_from_stats(stream_id: str, token: str, token_data: dict):
-    await asyncio.sleep(2)
-    
-    limits = token_data.get("limits", {}) if token_data else {}
-    usage = token_data.get("usage", {}) if token_data else {}
-    
-    daily_limit_gb = limits.get("daily_limit_gb")
-    monthly_limit_gb = limits.get("monthly_limit_gb")
-    
-    initial_daily_bytes = usage.get("daily", {}).get("bytes", 0)
-    initial_monthly_bytes = usage.get("monthly", {}).get("bytes", 0)
-    
-    last_tracked_bytes = 0
-    update_interval = 10
-    
+        try:
+            await super().__call__(scope, receive, timed_send)
+        finally:
+            admission.release(self.client_index)
+            token_limiter.close(self.token)
+
+
+def get_streamer(client) -> ByteStreamer:
+    if client not in _streamer_by_client:
+        _streamer_by_client[client] = ByteStreamer(client)
+    return _streamer_by_client[client]
+
+
+# a stream list must not wait on Telegram: unsigned URLs still play, they just resolve on GET
+SIGN_TIMEOUT = 1.5
+_sign_slots = asyncio.Semaphore(4)
+
+
+async def _resolve_for_signing(encoded_id: str) -> FileId:
+    decoded = await decode_string(encoded_id)
+    chat_id = int(f"-100{decoded['chat_id']}")
+    async with _sign_slots:
+        return await get_streamer(StreamBot).get_file_properties(chat_id=chat_id, message_id=int(decoded["msg_id"]))
+
+
+async def signed_stream_query(token: str, encoded_id: str) -> str:
     try:
-        while True:
-            await asyncio.sleep(update_interval)
-            stream_info = ACTIVE_STREAMS.get(stream_id)
-            if not stream_info:
-                for rec in RECENT_STREAMS:
-                    if rec.get("stream_id") == stream_id:
-                        final_bytes = rec.get("total_bytes", 0)
-                        delta = final_bytes - last_tracked_bytes
-                        if delta > 0:
-                            try:
-                                await db.update_token_usage(token, delta)
-                                LOGGER.debug(f"Final usage update for {stream_id}: {delta} bytes")
-                            except Exception as e:
-                                LOGGER.error(f"Final usage update failed: {e}")
-                        break
-                return
-            
-            current_bytes = stream_info.get("total_bytes", 0)
-            delta = current_bytes - last_tracked_bytes
-            
-            if delta > 0:
-                try:
-                    await db.update_token_usage(token, delta)
-                    last_tracked_bytes = current_bytes
-                    LOGGER.debug(f"Updated usage for {stream_id}: +{delta} bytes (total: {current_bytes})")
-                except Exception as e:
-                    LOGGER.error(f"Periodic usage update failed: {e}")
-            
-            # Check limits (don't stop stream, just log - client manages connection)
-            if daily_limit_gb and daily_limit_gb > 0:
-                current_daily_gb = (initial_daily_bytes + current_bytes) / (1024 ** 3)
-                if current_daily_gb >= daily_limit_gb:
-                    LOGGER.debug(f"Daily limit reached for token, stream {stream_id} may be blocked by verify_token")
-            
-            if monthly_limit_gb and monthly_limit_gb > 0:
-                current_monthly_gb = (initial_monthly_bytes + current_bytes) / (1024 ** 3)
-                if current_monthly_gb >= monthly_limit_gb:
-                    LOGGER.debug(f"Monthly limit reached for token, stream {stream_id} may be blocked by verify_token")
-                    
-    except asyncio.CancelledError:
-        stream_info = ACTIVE_STREAMS.get(stream_id)
-        if stream_info:
-            current_bytes = stream_info.get("total_bytes", 0)
-            delta = current_bytes - last_tracked_bytes
-            if delta > 0:
-                try:
-                    await db.update_token_usage(token, delta)
-                    LOGGER.info(f"Cancelled - final update for {stream_id}: {delta} bytes")
-                except Exception as e:
-                    LOGGER.error(f"Cancelled usage update failed: {e}")
+        # the lookup is shielded in the FileIdCache, so a timed out one still warms it for the next listing
+        file_id = await asyncio.wait_for(_resolve_for_signing(encoded_id), SIGN_TIMEOUT)
+    except Exception as e:
+        LOGGER.debug(f"Could not sign stream URL for {encoded_id}: {e!r}")
+        return ""
+    return sign_stream_query(token, encoded_id, file_id, *file_display(file_id))
+
+
+def stream_headers(file_name: str, mime_type: str, length: int, etag: Optional[str] = None) -> dict:
+    headers = {
+        "Content-Type": mime_type,
+        "Content-Length": str(length),
+        "Content-Disposition": f'inline; filename="{file_name}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=3600, immutable",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges, ETag",
+    }
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def multipart_layout(ranges: List[Tuple[int, int]], file_size: int, mime_type: str, boundary: str):
+    parts = []
+    for start, end in ranges:
+        head = (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mime_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+        ).encode()
+        parts.append((head, start, end))
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(head) + end - start + 1 for head, start, end in parts) + len(tail)
+    return parts, tail, length
+
+
+def range_response(ranges: List[Tuple[int, int]], file_size: int, file_name: str, mime_type: str, etag: str):
+    # status, headers and, for multiple ranges, the multipart/byteranges layout
+    if not ranges:
+        return 200, stream_headers(file_name, mime_type, file_size, etag), None
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers = stream_headers(file_name, mime_type, end - start + 1, etag)
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        return 206, headers, None
+
+    boundary = secrets.token_hex(12)
+    layout = multipart_layout(ranges, file_size, mime_type, boundary)
+    headers = stream_headers(file_name, f"multipart/byteranges; boundary={boundary}", layout[2], etag)
+    return 206, headers, layout
+
+
+async def multipart_body(layout, open_range, stream_id: str):
+    parts, tail, _ = layout
+    for n, (head, start, end) in enumerate(parts):
+        yield head
+        body = await open_range(start, end, f"{stream_id}-{n}")
+        try:
+            async for piece in body:
+                yield piece
+        finally:
+            await body.aclose()
+    yield tail
+
+
+def head_response(request: Request, file_size: int, file_name: str, mime_type: str, etag: str) -> Response:
+    ranges = requested_ranges(request, file_size, etag)
+    status, headers, _ = range_response(ranges, file_size, file_name, mime_type, etag)
+    return Response(status_code=status, headers=headers)
+
+
+async def cached_file_properties(chat_id: int, msg_id: int) -> FileId:
+    # any client's cached copy will do for metadata, Telegram is only asked when none has it
+    for streamer in _streamer_by_client.values():
+        file_id = streamer.peek_file_id(chat_id, msg_id)
+        if file_id is not None:
+            return file_id
+    streamer = _streamer_by_client.get(StreamBot)
+    if streamer is not None:
+        return await streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
+    # a bare HEAD must not be what creates a streamer and starts its media sessions
+    return await resolve_file_id(StreamBot, chat_id, msg_id)
+
+
+def file_display(file_id: FileId) -> Tuple[str, str]:
+    # derived from the file alone, so HEAD, GET and the signed query always agree
+    file_name = file_id.file_name or f"{file_id.unique_id[:8]}.bin"
+    mime_type = file_id.mime_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+    if "." not in file_name and "/" in mime_type:
+        file_name = f"{file_name}.{mime_type.split('/')[1]}"
+    return file_name, mime_type
 
 
-@router.get("/dl/{token}/{id}/{name}")
 @router.head("/dl/{token}/{id}/{name}")
+async def stream_head_handler(
+    request: Request,
+    token: str,
+    id: str,
+    name: str,
+    token_data: dict = Depends(verify_token),
+):
+    # metadata only: no media session, no work_loads change and no usage tracking
+    file_info = verify_stream_query(token, id, request.query_params)
+    if file_info:
+        file_size = file_info["file_size"]
+        etag = stream_etag(file_info["unique_prefix"], file_size)
+        return head_response(request, file_size, file_info["file_name"], file_info["mime_type"], etag)
+
+    decoded = await decode_string(id)
+    msg_id = decoded.get("msg_id")
+    if not msg_id:
+        raise HTTPException(status_code=400, detail="Missing id")
+
+    file_id = await cached_file_properties(int(f"-100{decoded['chat_id']}"), int(msg_id))
+    file_name, mime_type = file_display(file_id)
+    etag = stream_etag(file_id.unique_id[:6], file_id.file_size)
+    return head_response(request, file_id.file_size, file_name, mime_type, etag)
+
+
+@router.get("/dl/{token}/{id}/{name}")
 async def stream_handler(
     request: Request,
     token: str,
@@ -169,15 +321,20 @@ async def stream_handler(
     name: str,
     token_data: dict = Depends(verify_token),
 ):
+    file_info = verify_stream_query(token, id, request.query_params)
+
     decoded = await decode_string(id)
     msg_id = decoded.get("msg_id")
     if not msg_id:
         raise HTTPException(status_code=400, detail="Missing id")
 
     chat_id = int(f"-100{decoded['chat_id']}")
-    message = await StreamBot.get_messages(chat_id, int(msg_id))
-    file = message.video or message.document
-    secure_hash = file.file_unique_id[:6]
+    if file_info:
+        secure_hash = file_info["unique_prefix"]
+    else:
+        message = await StreamBot.get_messages(chat_id, int(msg_id))
+        file = message.video or message.document
+        secure_hash = file.file_unique_id[:6]
 
     return await media_streamer(
         request=request,
@@ -186,6 +343,7 @@ async def stream_handler(
         secure_hash=secure_hash,
         token=token,
         token_data=token_data,
+        file_info=file_info,
     )
 
 async def media_streamer(
@@ -195,38 +353,69 @@ async def media_streamer(
     secure_hash: str,
     token: str,
     token_data: dict = None,
+    file_info: dict = None,
 ):
-    temp_client = multi_clients[min(work_loads, key=work_loads.get)]
-    if temp_client not in _streamer_by_client:
-        _streamer_by_client[temp_client] = ByteStreamer(temp_client)
-    temp_streamer = _streamer_by_client[temp_client]
+    started = time.monotonic()
+    if file_info:
+        # signed URLs already carry the DC, so the file is resolved once, by the client that serves it
+        target_dc = file_info["dc_id"]
+    else:
+        temp_streamer = get_streamer(multi_clients[min(work_loads, key=work_loads.get)])
+        temp_file_id = await temp_streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
+        target_dc = temp_file_id.dc_id
+    LOGGER.debug(f"File msg_id={msg_id} is in DC {target_dc}")
+
+    try:
+        doc = token_data or {}
+        throttle = token_limiter.open(token, doc.get("limits"), doc.get("name"))
+    except StreamLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=e.message, headers={"Retry-After": "10"})
+
+    try:
+        index = await admission.acquire(lambda allowed: select_best_client(target_dc, allowed))
+    except BaseException as e:
+        token_limiter.close(token)
+        if isinstance(e, StreamBusy):
+            raise HTTPException(status_code=503, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+        raise
 
-    file_id = await temp_streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
+    try:
+        return await open_stream(
+            request, index, target_dc, chat_id, msg_id, secure_hash, token, token_data, throttle, started
+        )
+    except BaseException:
+        admission.release(index)
+        token_limiter.close(token)
+        raise
+
+
+async def open_stream(
+    request: Request,
+    index: int,
+    target_dc: int,
+    chat_id: int,
+    msg_id: int,
+    secure_hash: str,
+    token: str,
+    token_data: dict = None,
+    throttle: Optional[TokenBucket] = None,
+    started: Optional[float] = None,
+) -> StreamingResponse:
+    streamer = get_streamer(multi_clients[index])
+    file_id = await streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
 
     if secure_hash != "SKIP_HASH_CHECK":  # Don't check this it is for my Webdav
         if file_id.unique_id[:6] != secure_hash:
             raise InvalidHash
 
-    target_dc = file_id.dc_id
-    LOGGER.debug(f"File msg_id={msg_id} is in DC {target_dc}")
-
-    index = select_best_client(target_dc)
-    tg_client = multi_clients[index]
-
-    if tg_client not in _streamer_by_client:
-        _streamer_by_client[tg_client] = ByteStreamer(tg_client)
-    streamer: ByteStreamer = _streamer_by_client[tg_client]
+    streamer.prefetch_container_index(file_id, index)
 
     file_size = file_id.file_size
-    range_header = request.headers.get("Range", "")
-    start, end = parse_range_header(range_header, file_size)
-    req_length = end - start + 1
+    file_name, mime_type = file_display(file_id)
 
-    chunk_size = streamer.CHUNK_SIZE
-    offset = start - (start % chunk_size)
-    first_part_cut = start - offset
-    last_part_cut = (end % chunk_size) + 1
-    part_count = math.ceil(end / chunk_size) - math.floor(offset / chunk_size)
+    etag = stream_etag(file_id.unique_id[:6], file_size)
+    ranges = requested_ranges(request, file_size, etag)
+    status, headers, layout = range_response(ranges, file_size, file_name, mime_type, etag)
 
     stream_id = secrets.token_hex(8)
     meta = {
@@ -234,53 +423,77 @@ async def media_streamer(
         "client_host": request.client.host if request.client else None,
     }
 
-    prefetch_count = Telegram.PARALLEL
-    parallelism = Telegram.PRE_FETCH
+    prefetch_count = Telegram.PRE_FETCH
+    parallelism = Telegram.PARALLEL
 
-    body_gen = await streamer.prefetch_stream(
-        file_id=file_id,
-        client_index=index,
-        offset=offset,
-        first_part_cut=first_part_cut,
-        last_part_cut=last_part_cut,
-        part_count=part_count,
-        chunk_size=chunk_size,
-        prefetch=prefetch_count,
-        stream_id=stream_id,
-        meta=meta,
-        parallelism=parallelism,
-        request=request,
-    )
-
-    asyncio.create_task(track_usage_from_stats(stream_id, token, token_data))
-
-    file_name = file_id.file_name or f"{secrets.token_hex(4)}.bin"
-    mime_type = file_id.mime_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    spans = ranges or [(0, file_size - 1)]
+    multi_chunk = any(end // streamer.CHUNK_SIZE > start // streamer.CHUNK_SIZE for start, end in spans)
 
-    if "." not in file_name and "/" in mime_type:
-        file_name = f"{file_name}.{mime_type.split('/')[1]}"
-
-    headers = {
-        "Content-Type": mime_type,
-        "Content-Length": str(req_length),
-        "Content-Disposition": f'inline; filename="{file_name}"',
-        "Accept-Ranges": "bytes",
-        "Cache-Control": "public, max-age=3600, immutable",
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges",
-        "X-Stream-Id": stream_id,
-    }
+    stripe = []
+    if Telegram.STRIPE_CLIENTS > 1 and multi_chunk:
+        candidates = sorted(
+            (i for i in multi_clients if i != index and not client_health.in_cooldown(i)),
+            key=lambda i: client_health.score(i, target_dc)["score"],
+        )
+        for lane_index in candidates[: Telegram.STRIPE_CLIENTS - 1]:
+            lane_streamer = get_streamer(multi_clients[lane_index])
+            try:
+                # file ids are bot specific, so every client resolves its own copy
+                lane_file_id = await lane_streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
+            except Exception as e:
+                LOGGER.debug(f"Client {lane_index} cannot stripe msg_id={msg_id}: {e}")
+                continue
+            stripe.append((lane_index, lane_streamer, lane_file_id))
+
+    async def failover_client(exclude: Set[int]):
+        # a client outside the stream that can resolve the file, for chunks its own clients keep failing
+        for lane_index in sorted(
+            (i for i in multi_clients if i not in exclude),
+            key=lambda i: (client_health.in_cooldown(i), client_health.score(i, target_dc)["score"]),
+        ):
+            lane_streamer = get_streamer(multi_clients[lane_index])
+            try:
+                lane_file_id = await lane_streamer.get_file_properties(chat_id=chat_id, message_id=msg_id)
+            except Exception as e:
+                LOGGER.debug(f"Client {lane_index} cannot take over msg_id={msg_id}: {e}")
+                continue
+            return lane_index, lane_streamer, lane_file_id
+        return None
+
+    async def open_range(start: int, end: int, range_stream_id: str):
+        parts = RangePlan(start, end, lead_bytes=streamer.LEAD_BYTES)
+        body = await streamer.prefetch_stream(
+            file_id=file_id,
+            client_index=index,
+            parts=parts,
+            prefetch=prefetch_count,
+            stream_id=range_stream_id,
+            meta=meta,
+            parallelism=parallelism,
+            request=request,
+            stripe=stripe if parts.blocks > 1 else None,
+            throttle=throttle,
+            usage_token=token,
+            failover=failover_client,
+        )
+        return body
 
-    if range_header:
-        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
-        status = 206
+    if layout is None:
+        start, end = ranges[0] if ranges else (0, file_size - 1)
+        body_gen = await open_range(start, end, stream_id)
     else:
-        status = 200
-    return StreamingResponse(
+        # each part is its own prefetch_stream, opened when the previous one is done
+        body_gen = multipart_body(layout, open_range, stream_id)
+
+    headers["X-Stream-Id"] = stream_id
+    return AdmittedStreamingResponse(
         content=body_gen,
         headers=headers,
         status_code=status,
-        media_type=mime_type,
+        media_type=headers["Content-Type"],
+        client_index=index,
+        token=token,
+        started=started,
     )
 
 @router.get("/stream/stats")
@@ -312,6 +525,8 @@ async def get_stream_stats():
                 "instant_mbps": round(info.get("instant_mbps", 0.0), 3),
                 "avg_mbps": round(info.get("avg_mbps", 0.0), 3),
                 "peak_mbps": round(info.get("peak_mbps", 0.0), 3),
+                "parallelism": info.get("parallelism", {}).get("window"),
+                "failovers": info.get("failover_count", 0),
                 "start_ts": info.get("start_ts"),
             }
         )
@@ -329,6 +544,7 @@ async def get_stream_stats():
                 "total_bytes": info.get("total_bytes"),
                 "duration": info.get("duration"),
                 "avg_mbps": round(info.get("avg_mbps", 0.0), 3),
+                "failovers": info.get("failover_count", 0),
                 "start_ts": info.get("start_ts"),
                 "end_ts": info.get("end_ts"),
             }
@@ -340,9 +556,33 @@ async def get_stream_stats():
             "recent_streams": recent,
             "client_dc_map": client_dc_map,
             "work_loads": work_loads,
+            "chunk_cache": chunk_cache.stats(),
+            "disk_chunk_cache": disk_chunk_cache.stats(),
+            "chunk_requests": {**FETCH_STATS, "inflight": len(INFLIGHT_CHUNKS)},
+            "global_inflight": GLOBAL_INFLIGHT["count"],
+            "admission": admission.stats(),
+            "token_limits": token_limiter.stats(),
+            "usage": usage_aggregator.stats(),
+            "token_cache": token_cache.stats(),
+            "index_prefetch": INDEX_STATS,
+            "file_id_cache": {
+                index: _streamer_by_client[client].file_id_cache_info()
+                for index, client in multi_clients.items()
+                if client in _streamer_by_client
+            },
+            "file_id_store": file_id_store.stats(),
+            "session_pools": {
+                index: _streamer_by_client[client].session_pool_info()
+                for index, client in multi_clients.items()
+                if client in _streamer_by_client
+            },
         }
     )
 
+@router.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @router.get("/stream/stats/{stream_id}")
 async def get_stream_detail(stream_id: str):
     info = ACTIVE_STREAMS.get(stream_id)
@@ -354,3 +594,14 @@ async def get_stream_detail(stream_id: str):
             return JSONResponse(make_json_safe(rec))
 
     raise HTTPException(status_code=404, detail="Stream not found")
+
+@router.get("/stream/stats/{stream_id}/timeline")
+async def get_stream_timeline(stream_id: str):
+    timeline = stream_timelines.get(stream_id)
+    if timeline is not None:
+        return JSONResponse(timeline.snapshot())
+    # X-Stream-Id of a multi-range response names the parent, its parts were recorded separately
+    parts = stream_timelines.parts(stream_id)
+    if not parts:
+        raise HTTPException(status_code=404, detail="No timeline recorded for this stream")
+    return JSONResponse({"stream_id": stream_id, "parts": [part.snapshot() for part in parts]})
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional
 from urllib.parse import unquote
@@ -6,6 +7,7 @@ from Backend import db, __version__
 import PTN
 from datetime import datetime, timezone, timedelta
 from Backend.fastapi.security.tokens import verify_token
+from Backend.fastapi.routes.stream_routes import signed_stream_query
 
 
 # --- Configuration ---
@@ -326,11 +328,17 @@ async def get_streams(token: str, media_type: str, id: str, token_data: dict = D
     if not media_details or "telegram" not in media_details:
         return {"streams": []}
 
+    qualities = [q for q in media_details.get("telegram", []) if q.get("id")]
+    signed_queries = await asyncio.gather(*(
+        signed_stream_query(token, q["id"])
+        for q in qualities
+        if not q["id"].startswith(("http://", "https://"))
+    ))
+    signed_queries = iter(signed_queries)
+
     streams = []
-    for quality in media_details.get("telegram", []):
+    for quality in qualities:
         file_id = quality.get("id")
-        if not file_id:
-            continue
 
         filename = quality.get("name", "")
         quality_str = quality.get("quality", "HD")
@@ -340,11 +348,13 @@ async def get_streams(token: str, media_type: str, id: str, token_data: dict = D
             filename, quality_str, size, file_id
         )
 
-        url = (
-            file_id
-            if file_id.startswith(("http://", "https://"))
-            else f"{BASE_URL}/dl/{token}/{file_id}/video.mkv"
-        )
+        if file_id.startswith(("http://", "https://")):
+            url = file_id
+        else:
+            url = f"{BASE_URL}/dl/{token}/{file_id}/video.mkv"
+            query = next(signed_queries)
+            if query:
+                url = f"{url}?{query}"
 
         streams.append({
             "name": stream_name,
@@ -1,15 +1,47 @@
+from datetime import datetime, timezone
+
 from fastapi import HTTPException
 from Backend import db
+from Backend.helper.token_cache import token_cache
+from Backend.helper.usage import usage_aggregator
 
 DAILY_LIMIT_VIDEO = "https://bit.ly/3YZFKT5"
 MONTHLY_LIMIT_VIDEO = "https://bit.ly/4rfjtgd"
 
 
+def merged_usage(token: str, usage: dict, usage_base: int) -> dict:
+    # the cached document plus the bytes this process counted after it was loaded
+    local = usage_aggregator.added_bytes(token) - usage_base
+    if local <= 0:
+        return usage
+
+    now = datetime.now(timezone.utc)
+    today, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+    daily = usage.get("daily", {})
+    monthly = usage.get("monthly", {})
+    return {
+        **usage,
+        "total_bytes": usage.get("total_bytes", 0) + local,
+        "daily": {"date": today, "bytes": (daily.get("bytes", 0) if daily.get("date") == today else 0) + local},
+        "monthly": {"month": month, "bytes": (monthly.get("bytes", 0) if monthly.get("month") == month else 0) + local},
+    }
+
+
 async def verify_token(token: str):
-    token_data = await db.get_api_token(token)
-    if not token_data:
+    cached = token_cache.get(token)
+    if cached is None:
+        # taken before the read so a flush landing in between is counted twice rather than missed
+        usage_base = usage_aggregator.flushed_bytes(token)
+        cached = token_cache.put(token, await db.get_api_token(token), usage_base)
+
+    doc, usage_base = cached
+    if not doc:
         raise HTTPException(status_code=401, detail="Invalid or expired API token")
 
+    # callers annotate the result, the cached document stays untouched
+    token_data = dict(doc)
+    token_data["usage"] = merged_usage(token, doc.get("usage", {}), usage_base)
+
     limits = token_data.get("limits", {})
     usage = token_data.get("usage", {})
 
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from Backend.config import Telegram
+from Backend.helper.exceptions import StreamBusy
+from Backend.helper.metrics import QUEUE_DEPTH
+from Backend.pyrofork.bot import multi_clients
+
+# picks a client index among the clients the predicate allows, None when there is none
+Picker = Callable[[Callable[[int], bool]], Optional[int]]
+
+
+class AdmissionController:
+    WAIT_ALPHA = 0.2
+    DEFAULT_RETRY_AFTER = 5
+
+    def __init__(self, max_streams: int, per_client: int, queue_size: int, queue_timeout: float):
+        self.max_streams = max(0, max_streams)
+        self.per_client = max(0, per_client)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.streams: Dict[int, int] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        # woken waiters that have not taken their slot yet, newcomers must not jump ahead of them
+        self._handoffs = 0
+        self._avg_wait: Optional[float] = None
+        self.recent_waits: Deque[float] = deque(maxlen=256)
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def limit(self) -> int:
+        # 0 means the per-client cap times the number of clients, or no cap at all
+        return self.max_streams or self.per_client * len(multi_clients)
+
+    @property
+    def active(self) -> int:
+        return sum(self.streams.values())
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def retry_after(self) -> int:
+        if self._avg_wait is None:
+            return self.DEFAULT_RETRY_AFTER
+        return max(1, min(int(self.queue_timeout), round(self._avg_wait * 2)))
+
+    def has_room(self, client_index: int) -> bool:
+        return not self.per_client or self.streams.get(client_index, 0) < self.per_client
+
+    def _try_admit(self, pick: Picker) -> Optional[int]:
+        if self.limit and self.active >= self.limit:
+            return None
+        index = pick(self.has_room)
+        if index is not None:
+            self.streams[index] = self.streams.get(index, 0) + 1
+        return index
+
+    async def acquire(self, pick: Picker) -> int:
+        started = time.monotonic()
+        index = None
+        if not self._waiters and not self._handoffs:
+            index = self._try_admit(pick)
+
+        front = False
+        while index is None:
+            remaining = started + self.queue_timeout - time.monotonic()
+            if remaining <= 0 or (not front and len(self._waiters) >= self.queue_size):
+                if remaining <= 0:
+                    self.timeouts += 1
+                else:
+                    self.rejected += 1
+                raise StreamBusy(self.retry_after)
+
+            waiter = asyncio.get_running_loop().create_future()
+            if front:
+                # woken but beaten to the slot, keep the place at the head of the queue
+                self._waiters.appendleft(waiter)
+            else:
+                self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise StreamBusy(self.retry_after) from None
+            except BaseException:
+                if waiter.done() and not waiter.cancelled():
+                    # woken right before going away, pass the slot on
+                    self._handoffs -= 1
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+            self._handoffs -= 1
+            index = self._try_admit(pick)
+            front = True
+
+        wait = time.monotonic() - started
+        self.admitted += 1
+        if front:
+            self.waited += 1
+            self.recent_waits.append(wait)
+            self._avg_wait = wait if self._avg_wait is None else self._avg_wait + self.WAIT_ALPHA * (wait - self._avg_wait)
+        return index
+
+    def release(self, client_index: int) -> None:
+        self.streams[client_index] = max(0, self.streams.get(client_index, 0) - 1)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._handoffs += 1
+                waiter.set_result(None)
+                return
+
+    def stats(self) -> dict:
+        waits = sorted(self.recent_waits)
+        return {
+            "active": self.active,
+            "limit": self.limit,
+            "per_client_limit": self.per_client,
+            "streams": dict(self.streams),
+            "queued": self.queued,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 1),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1),
+                "max": round(waits[-1] * 1000, 1),
+            } if waits else None,
+        }
+
+
+admission = AdmissionController(
+    Telegram.MAX_STREAMS,
+    Telegram.MAX_STREAMS_PER_CLIENT,
+    Telegram.STREAM_QUEUE_SIZE,
+    Telegram.STREAM_QUEUE_TIMEOUT,
+)
+QUEUE_DEPTH.set_function(lambda: admission.queued)
@@ -0,0 +1,295 @@
+import asyncio
+import mmap
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from Backend.config import Telegram
+from Backend.logger import LOGGER
+
+# (media_id, aligned offset) for 1 MB blocks, (media_id, offset, limit) for smaller edge requests
+ChunkKey = Tuple[int, ...]
+
+
+class ChunkCache:
+    POLICIES = ("lru", "lfu")
+
+    def __init__(self, max_bytes: int, policy: str = "lru"):
+        self.max_bytes = max(0, int(max_bytes))
+        self.policy = policy if policy in self.POLICIES else "lru"
+        self._entries: "OrderedDict[ChunkKey, bytes]" = OrderedDict()
+        # LFU: access count per key and the keys of each count, least recently used first,
+        # so the victim is always the head of the lowest bucket
+        self._freq: Dict[ChunkKey, int] = {}
+        self._buckets: Dict[int, "OrderedDict[ChunkKey, None]"] = {}
+        self._min_freq = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: ChunkKey) -> Optional[bytes]:
+        chunk = self._entries.get(key)
+        if chunk is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if self.policy == "lfu":
+            self._count(key, self._uncount(key) + 1)
+        else:
+            self._entries.move_to_end(key)
+        return chunk
+
+    def contains(self, key: ChunkKey) -> bool:
+        # a probe, not a read: no hit or miss and no change to the eviction order
+        return key in self._entries
+
+    def put(self, key: ChunkKey, chunk: bytes) -> None:
+        if not self.enabled or not chunk:
+            return
+
+        size = len(chunk)
+        if size > self.max_bytes:
+            self.rejected += 1
+            return
+
+        freq = 0
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+            if self.policy == "lfu":
+                freq = self._uncount(key)
+
+        while self._entries and self.size + size > self.max_bytes:
+            self._evict()
+
+        self._entries[key] = chunk
+        self.size += size
+        if self.policy == "lfu":
+            self._count(key, freq + 1)
+
+    def _count(self, key: ChunkKey, freq: int) -> None:
+        # _min_freq never exceeds the lowest count in use, it may only point at an emptied bucket
+        if freq < self._min_freq or not self._buckets:
+            self._min_freq = freq
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def _uncount(self, key: ChunkKey) -> int:
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if freq == self._min_freq:
+                # the key moves to freq + 1 right away, or an eviction looks the minimum up again
+                self._min_freq = freq + 1
+        return freq
+
+    def _evict(self) -> None:
+        if self.policy == "lfu":
+            if self._min_freq not in self._buckets:
+                # only after a whole bucket was evicted, and bounded by the number of distinct counts
+                self._min_freq = min(self._buckets)
+            victim = next(iter(self._buckets[self._min_freq]))
+            self._uncount(victim)
+        else:
+            victim = next(iter(self._entries))
+
+        chunk = self._entries.pop(victim)
+        self.size -= len(chunk)
+        self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._freq.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+        self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class DiskChunkCache:
+    SUFFIX = ".chunk"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self._index: "OrderedDict[ChunkKey, int]" = OrderedDict()
+        self._writing: Set[ChunkKey] = set()
+        self._loaded = False
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self._loaded
+
+    def _path(self, key: ChunkKey) -> str:
+        return os.path.join(self.directory, f"{key[0]}_{key[1]}{self.SUFFIX}")
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(self.SUFFIX + ".tmp"):
+                # leftovers from writes interrupted by a restart
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            if not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                media_id, offset = entry.name[: -len(self.SUFFIX)].split("_")
+                st = entry.stat()
+                found.append((st.st_atime, (int(media_id), int(offset)), st.st_size))
+            except (ValueError, OSError):
+                continue
+        found.sort()
+        return found
+
+    async def load(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        try:
+            found = await asyncio.to_thread(self._scan)
+        except OSError as e:
+            LOGGER.error(f"Disk chunk cache disabled, cannot use {self.directory}: {e}")
+            return
+
+        for _, key, size in found:
+            self._index[key] = size
+            self.size += size
+        self._loaded = True
+        await self._trim()
+        LOGGER.info(
+            f"Disk chunk cache ready: {len(self._index)} chunks, "
+            f"{self.size / (1024 ** 3):.2f}/{self.max_bytes / (1024 ** 3):.2f} GB in {self.directory}"
+        )
+
+    def _map(self, key: ChunkKey) -> memoryview:
+        with open(self._path(key), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # the mapping outlives the file handle and is unmapped once the view is released
+        return memoryview(mm)
+
+    async def get(self, key: ChunkKey) -> Optional[memoryview]:
+        if key not in self._index:
+            self.misses += 1
+            return None
+
+        try:
+            view = await asyncio.to_thread(self._map, key)
+        except (OSError, ValueError) as e:
+            LOGGER.debug(f"Disk chunk cache read failed for {key}: {e}")
+            self._forget(key)
+            self.errors += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if key in self._index:
+            self._index.move_to_end(key)
+        return view
+
+    def contains(self, key: ChunkKey) -> bool:
+        return self.enabled and key in self._index
+
+    def _write(self, key: ChunkKey, chunk: bytes) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(chunk)
+        os.replace(tmp_path, path)
+
+    async def put(self, key: ChunkKey, chunk: bytes) -> None:
+        if not self.enabled or not chunk or key in self._index or key in self._writing:
+            return
+        if len(chunk) > self.max_bytes:
+            return
+
+        self._writing.add(key)
+        try:
+            await asyncio.to_thread(self._write, key, chunk)
+        except OSError as e:
+            LOGGER.debug(f"Disk chunk cache write failed for {key}: {e}")
+            self.errors += 1
+            return
+        finally:
+            self._writing.discard(key)
+
+        self._index[key] = len(chunk)
+        self.size += len(chunk)
+        self.writes += 1
+        await self._trim()
+
+    def _forget(self, key: ChunkKey) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self.size -= size
+
+    async def _trim(self) -> None:
+        victims = []
+        while self._index and self.size > self.max_bytes:
+            key = next(iter(self._index))
+            self._forget(key)
+            victims.append(self._path(key))
+            self.evictions += 1
+
+        if victims:
+            await asyncio.to_thread(self._unlink, victims)
+
+    @staticmethod
+    def _unlink(paths) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "entries": len(self._index),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writes": self.writes,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+chunk_cache = ChunkCache(Telegram.CHUNK_CACHE_MB * 1024 * 1024, Telegram.CHUNK_CACHE_POLICY)
+disk_chunk_cache = DiskChunkCache(Telegram.DISK_CACHE_DIR, Telegram.DISK_CACHE_GB * 1024 ** 3)
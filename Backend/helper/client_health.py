@@ -0,0 +1,177 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple, Union
+
+from Backend.helper.metrics import FLOOD_WAITS
+from Backend.pyrofork.bot import work_loads, client_dc_map, multi_clients
+
+# a multi_clients index, or the name of a client that does not stream (the helper bot)
+ClientKey = Union[int, str]
+
+
+class FloodSleepFilter(logging.Filter):
+    # pyrogram sleeps off FloodWaits below sleep_threshold itself and only logs them:
+    # '[%s] Waiting for %s seconds before continuing (required by "%s")'
+    def __init__(self, health: "ClientHealth", level: int):
+        super().__init__()
+        self.health = health
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and record.msg.startswith("[%s] Waiting for") and isinstance(record.args, tuple) and len(record.args) >= 2:
+            try:
+                name, seconds = record.args[0], float(record.args[1])
+            except (TypeError, ValueError):
+                pass
+            else:
+                self.health.record_flood_wait(self.health.key_for_name(str(name)), seconds, "sleep")
+        # keep the level the logger had before the hook lowered it
+        return record.levelno >= self.level
+
+
+class ClientHealth:
+    LATENCY_ALPHA = 0.3
+    DEFAULT_LATENCY = 0.3  # seconds, used until a (client, DC) pair has been measured
+
+    # score weights, lower total score wins
+    BYTES_WEIGHT = 1.0 / (1024 * 1024)  # one point per MB in flight
+    LATENCY_WEIGHT = 10.0  # one point per 100 ms of chunk latency
+    FLOOD_WEIGHT = 1.0  # one point per second of FloodWait, decaying to zero
+    FLOOD_DECAY = 60.0  # seconds a FloodWait keeps counting after it is over
+    STREAM_WEIGHT = 0.1
+    DC_BONUS = 1.0
+
+    def __init__(self):
+        self.inflight_bytes: Dict[int, int] = {}
+        self.latency: Dict[Tuple[int, int], float] = {}
+        self.flood_waits: Dict[ClientKey, Tuple[float, float]] = {}  # client -> (seconds, recorded at)
+        self.flood_sources: Dict[ClientKey, str] = {}
+        self.flood_counts: Dict[ClientKey, int] = {}
+
+    def request_started(self, client_index: int, nbytes: int) -> None:
+        self.inflight_bytes[client_index] = self.inflight_bytes.get(client_index, 0) + nbytes
+
+    def request_finished(self, client_index: int, nbytes: int) -> None:
+        self.inflight_bytes[client_index] = max(0, self.inflight_bytes.get(client_index, 0) - nbytes)
+
+    def record_latency(self, client_index: int, dc_id: int, latency: float) -> None:
+        key = (client_index, dc_id)
+        old = self.latency.get(key)
+        self.latency[key] = latency if old is None else old + self.LATENCY_ALPHA * (latency - old)
+
+    @staticmethod
+    def key_for_name(name: str) -> ClientKey:
+        for index, client in multi_clients.items():
+            if getattr(client, "name", None) == name:
+                return index
+        return name
+
+    def key_for(self, client) -> ClientKey:
+        return self.key_for_name(getattr(client, "name", str(client)))
+
+    def record_flood_wait(self, client: ClientKey, seconds: float, source: str = "stream") -> None:
+        now = time.time()
+        current = self.flood_waits.get(client)
+        # a shorter wait does not end a longer one that is still running
+        if current is None or now + seconds > current[1] + current[0]:
+            self.flood_waits[client] = (float(seconds), now)
+            self.flood_sources[client] = source
+        self.flood_counts[client] = self.flood_counts.get(client, 0) + 1
+        FLOOD_WAITS.labels(client, source).inc()
+
+    def cooldown(self, client: ClientKey, now: Optional[float] = None) -> float:
+        # seconds left until the client may call Telegram again
+        flood = self.flood_waits.get(client)
+        if not flood:
+            return 0.0
+        seconds, recorded_at = flood
+        return max(0.0, recorded_at + seconds - (now or time.time()))
+
+    def in_cooldown(self, client: ClientKey, now: Optional[float] = None) -> bool:
+        return self.cooldown(client, now) > 0
+
+    def cooldowns(self) -> Dict[ClientKey, dict]:
+        now = time.time()
+        return {
+            client: {
+                "remaining": round(self.cooldown(client, now), 1),
+                "seconds": seconds,
+                "source": self.flood_sources.get(client),
+                "count": self.flood_counts.get(client, 0),
+                "penalty": round(self._flood_penalty(client, now), 1),
+            }
+            for client, (seconds, _) in self.flood_waits.items()
+            if self._flood_penalty(client, now) > 0
+        }
+
+    def watch_pyrogram_sleeps(self) -> None:
+        session_logger = logging.getLogger("pyrogram.session.session")
+        if any(isinstance(f, FloodSleepFilter) for f in session_logger.filters):
+            return
+        level = session_logger.getEffectiveLevel()
+        session_logger.addFilter(FloodSleepFilter(self, level))
+        session_logger.setLevel(min(level, logging.WARNING))
+
+    def _flood_penalty(self, client_index: int, now: float) -> float:
+        flood = self.flood_waits.get(client_index)
+        if not flood:
+            return 0.0
+        seconds, recorded_at = flood
+        age = now - recorded_at
+        if age >= seconds + self.FLOOD_DECAY:
+            return 0.0
+        if age < seconds:
+            return seconds - age + self.FLOOD_DECAY / 2
+        # after the wait, the penalty fades out linearly
+        return (self.FLOOD_DECAY / 2) * (1 - (age - seconds) / self.FLOOD_DECAY)
+
+    def score(self, client_index: int, target_dc: Optional[int], now: Optional[float] = None) -> dict:
+        now = now or time.time()
+        inflight = self.inflight_bytes.get(client_index, 0)
+        latency = self.latency.get((client_index, target_dc))
+        flood = self._flood_penalty(client_index, now)
+        dc_match = target_dc is not None and client_dc_map.get(client_index) == target_dc
+        streams = work_loads.get(client_index, 0)
+
+        total = (
+            inflight * self.BYTES_WEIGHT
+            + (latency if latency is not None else self.DEFAULT_LATENCY) * self.LATENCY_WEIGHT
+            + flood * self.FLOOD_WEIGHT
+            + streams * self.STREAM_WEIGHT
+            - (self.DC_BONUS if dc_match else 0.0)
+        )
+        return {
+            "score": round(total, 3),
+            "inflight_bytes": inflight,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "flood_penalty": round(flood, 1),
+            "dc_match": dc_match,
+            "streams": streams,
+        }
+
+    def scores(self, target_dc: Optional[int] = None) -> Dict[int, dict]:
+        now = time.time()
+        return {index: self.score(index, target_dc, now) for index in work_loads}
+
+    def snapshot(self) -> Dict[int, dict]:
+        return {
+            index: {
+                "dc": client_dc_map.get(index),
+                "streams": work_loads.get(index, 0),
+                "inflight_bytes": self.inflight_bytes.get(index, 0),
+                "latency_ms": {
+                    dc: round(latency * 1000, 1)
+                    for (client, dc), latency in self.latency.items()
+                    if client == index
+                },
+                "flood_penalty": round(self._flood_penalty(index, time.time()), 1),
+                "cooldown": round(self.cooldown(index), 1),
+                "scores_by_dc": {
+                    dc: self.score(index, dc)["score"] for dc in sorted({d for _, d in self.latency} | {1, 2, 3, 4, 5})
+                },
+            }
+            for index in work_loads
+        }
+
+
+client_health = ClientHealth()
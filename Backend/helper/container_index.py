@@ -0,0 +1,164 @@
+import struct
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# (offset, length) -> bytes, shorter than length at the end of the file
+Reader = Callable[[int, int], Awaitable[bytes]]
+ByteRange = Tuple[int, int]
+
+MP4_TOP_LEVEL = {b"ftyp", b"styp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pdin", b"moof", b"uuid"}
+MP4_MAX_BOXES = 64
+
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+EBML_HEAD_BYTES = 64 * 1024
+SEGMENT_ID = 0x18538067
+SEEK_HEAD_ID = 0x114D9B74
+SEEK_ID = 0x4DBB
+SEEK_ID_ID = 0x53AB
+SEEK_POSITION_ID = 0x53AC
+CUES_ID = 0x1C53BB6B
+CLUSTER_ID = 0x1F43B675
+# real SeekHeads are a few hundred bytes, a larger size is a corrupt or hostile file
+SEEK_HEAD_MAX_BYTES = 64 * 1024
+
+
+async def index_ranges(read: Reader, file_size: int) -> List[ByteRange]:
+    # byte ranges a player reads before it can seek: the MP4 moov box or the Matroska Cues
+    head = await read(0, 16)
+    if head[:4] == EBML_MAGIC:
+        return await mkv_index_ranges(read, file_size)
+    if len(head) >= 8 and head[4:8] in MP4_TOP_LEVEL:
+        return await mp4_index_ranges(read, file_size)
+    return []
+
+
+async def mp4_index_ranges(read: Reader, file_size: int) -> List[ByteRange]:
+    offset = 0
+    for _ in range(MP4_MAX_BOXES):
+        if offset + 8 > file_size:
+            break
+        header = await read(offset, 16)
+        if len(header) < 8:
+            break
+
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if size == 1:
+            if len(header) < 16:
+                break
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_len:
+            break
+
+        if box_type == b"moov":
+            return [(offset, min(offset + size, file_size) - 1)]
+        offset += size
+    return []
+
+
+def _vint(data: bytes, pos: int, keep_marker: bool) -> Tuple[Optional[int], int]:
+    if pos >= len(data):
+        raise ValueError("truncated EBML element")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(data):
+        raise ValueError("invalid EBML variable size integer")
+
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        # all ones means the size is unknown (live or unfinished files)
+        return None, length
+    return value, length
+
+
+def _element(data: bytes, pos: int) -> Tuple[int, Optional[int], int]:
+    element_id, id_len = _vint(data, pos, keep_marker=True)
+    size, size_len = _vint(data, pos + id_len, keep_marker=False)
+    return element_id, size, id_len + size_len
+
+
+def _seek_positions(data: bytes, segment_start: int) -> Dict[int, int]:
+    positions = {}
+    pos = 0
+    while pos < len(data):
+        element_id, size, header_len = _element(data, pos)
+        if size is None:
+            break
+        if element_id == SEEK_ID:
+            body = data[pos + header_len:pos + header_len + size]
+            seek_id = seek_position = None
+            child = 0
+            while child < len(body):
+                child_id, child_size, child_header = _element(body, child)
+                if child_size is None:
+                    break
+                value = int.from_bytes(body[child + child_header:child + child_header + child_size], "big")
+                if child_id == SEEK_ID_ID:
+                    seek_id = value
+                elif child_id == SEEK_POSITION_ID:
+                    seek_position = value
+                child += child_header + child_size
+            if seek_id is not None and seek_position is not None:
+                positions.setdefault(seek_id, segment_start + seek_position)
+        pos += header_len + size
+    return positions
+
+
+async def _read_element(read: Reader, offset: int) -> Tuple[int, Optional[int], int]:
+    return _element(await read(offset, 16), 0)
+
+
+async def mkv_index_ranges(read: Reader, file_size: int) -> List[ByteRange]:
+    head = await read(0, EBML_HEAD_BYTES)
+    try:
+        _, ebml_size, header_len = _element(head, 0)
+        pos = header_len + ebml_size
+        segment_id, _, header_len = _element(head, pos)
+        if segment_id != SEGMENT_ID:
+            return []
+        segment_start = pos + header_len
+
+        positions: Dict[int, int] = {}
+        pos = segment_start
+        while pos < len(head):
+            element_id, size, header_len = _element(head, pos)
+            if element_id == CUES_ID:
+                positions.setdefault(CUES_ID, pos)
+            if element_id == CLUSTER_ID or size is None:
+                # media data starts here, everything else has to come from the SeekHead
+                break
+            if element_id == SEEK_HEAD_ID:
+                if size > SEEK_HEAD_MAX_BYTES:
+                    return []
+                body = head[pos + header_len:pos + header_len + size]
+                if len(body) < size:
+                    body = await read(pos + header_len, size)
+                for seek_id, position in _seek_positions(body, segment_start).items():
+                    positions.setdefault(seek_id, position)
+            pos += header_len + size
+
+        cues = positions.get(CUES_ID)
+        if cues is None and positions.get(SEEK_HEAD_ID, 0) >= pos:
+            # a second SeekHead, usually written at the end of the file
+            seek_head = positions[SEEK_HEAD_ID]
+            element_id, size, header_len = await _read_element(read, seek_head)
+            if element_id == SEEK_HEAD_ID and size is not None and size <= SEEK_HEAD_MAX_BYTES:
+                body = await read(seek_head + header_len, size)
+                cues = _seek_positions(body, segment_start).get(CUES_ID)
+        if cues is None or cues >= file_size:
+            return []
+
+        element_id, size, header_len = await _read_element(read, cues)
+        if element_id != CUES_ID or size is None:
+            return []
+        return [(cues, min(cues + header_len + size, file_size) - 1)]
+    except ValueError:
+        return []
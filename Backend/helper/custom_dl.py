@@ -1,117 +1,277 @@
 import asyncio
 import time
 import secrets
-from collections import deque
-from typing import Dict, Union, Optional, Tuple
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Set, Union, Optional, Tuple
 import traceback
 from fastapi import Request
 from pyrogram import Client, raw, utils
-from pyrogram.errors import AuthBytesInvalid
+from pyrogram.errors import AuthBytesInvalid, FloodWait, FileReferenceExpired, FileReferenceInvalid
 from pyrogram.file_id import FileId, FileType, ThumbnailSource
 from pyrogram.session import Session, Auth
 from Backend.logger import LOGGER
-from Backend.helper.exceptions import FIleNotFound
+from Backend.config import Telegram
+from Backend.helper.exceptions import CoalescedFetchFailed, FIleNotFound
+from Backend.helper.chunk_cache import chunk_cache, disk_chunk_cache
+from Backend.helper.parallelism import GLOBAL_INFLIGHT, ParallelismController
+from Backend.helper.client_health import client_health
+from Backend.helper.session_pool import MediaSessionPool
+from Backend.helper.file_id_cache import FileIdCache
+from Backend.helper.file_id_store import file_id_store
+from Backend.helper.container_index import index_ranges
+from Backend.helper.range_planner import FilePart, RangePlan
+from Backend.helper.token_limits import TokenBucket
+from Backend.helper.usage import usage_aggregator
+from Backend.helper.stream_timeline import stream_timelines
+from Backend.helper.metrics import (
+    ACTIVE_STREAMS_GAUGE, BYTES_SERVED, CHUNK_FAILOVERS, CHUNK_LATENCY, CHUNK_RETRIES, CHUNKS_FETCHED,
+    REFERENCE_REFRESHES, STREAM_DURATION, WASTED_BYTES,
+)
 from Backend.helper.pyro import get_file_ids
 from Backend.pyrofork.bot import work_loads
 
 ACTIVE_STREAMS: Dict[str, Dict] = {}
 RECENT_STREAMS = deque(maxlen=3)
 
+# GetFile requests currently on the wire, keyed like the chunk cache
+INFLIGHT_CHUNKS: Dict[Tuple[int, int], asyncio.Task] = {}
+FETCH_STATS = {"requests": 0, "coalesced": 0, "bytes_fetched": 0, "bytes_served": 0, "reference_refreshes": 0}
+
+# message re-resolves after an expired file reference, keyed by (bot, chat_id, msg_id)
+REFRESHING_FILE_IDS: Dict[Tuple[str, int, int], asyncio.Task] = {}
+
+# media ids whose seek index was already prefetched, oldest first
+INDEXED_MEDIA: "OrderedDict[int, float]" = OrderedDict()
+INDEX_STATS = {"files": 0, "ranges": 0, "bytes": 0, "errors": 0}
+
+# fire-and-forget work, held here so a task is not garbage-collected before it finishes
+BACKGROUND_TASKS: Set[asyncio.Task] = set()
+
+ACTIVE_STREAMS_GAUGE.set_function(lambda: sum(1 for s in ACTIVE_STREAMS.values() if s.get("status") == "active"))
+
+
+def _background(coro, what: str) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(lambda t: _background_done(t, what))
+    return task
+
+
+def _background_done(task: asyncio.Task, what: str) -> None:
+    BACKGROUND_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        LOGGER.warning(f"Background {what} failed: {task.exception()!r}")
+
+
+def _release_inflight(cache_key: Tuple[int, int], task: asyncio.Task, inflight: Dict = INFLIGHT_CHUNKS) -> None:
+    if inflight.get(cache_key) is task:
+        inflight.pop(cache_key, None)
+    if not task.cancelled():
+        # mark the exception as retrieved when every waiter has already gone away
+        task.exception()
+
+class StreamStats:
+    # per-stream counters kept off the shared registry and published every PUBLISH_INTERVAL
+    PUBLISH_INTERVAL = 0.5
+
+    __slots__ = (
+        "entry", "start_ts", "last_ts", "total_bytes", "instant_mbps", "peak_mbps", "recent",
+        "published_at", "served_published", "usage_token",
+    )
+
+    def __init__(self, entry: dict, usage_token: Optional[str] = None):
+        self.entry = entry
+        self.usage_token = usage_token
+        self.start_ts = entry["start_ts"]
+        self.last_ts = entry["last_ts"]
+        self.total_bytes = entry["total_bytes"]
+        self.instant_mbps = entry["instant_mbps"]
+        self.peak_mbps = entry["peak_mbps"]
+        self.recent = entry["recent_measurements"]
+        self.published_at = self.start_ts
+        self.served_published = self.total_bytes
+
+    def record(self, nbytes: int) -> None:
+        now_ts = time.time()
+        elapsed = now_ts - self.last_ts
+        if elapsed <= 0:
+            elapsed = 1e-6
+
+        recent = self.recent
+        recent.append((nbytes, elapsed))
+        if len(recent) >= 2:
+            total_bytes = sum(b for b, _ in recent)
+            total_time = sum(t for _, t in recent)
+            self.instant_mbps = min((total_bytes / (1024 * 1024)) / max(total_time, 0.01), 1000.0)
+        else:
+            self.instant_mbps = 0.0
+
+        if self.instant_mbps > self.peak_mbps:
+            self.peak_mbps = self.instant_mbps
+
+        self.total_bytes += nbytes
+        self.last_ts = now_ts
+
+        if now_ts - self.published_at >= self.PUBLISH_INTERVAL:
+            self.publish()
+
+    def publish(self) -> None:
+        total_time = self.last_ts - self.start_ts
+        if total_time <= 0:
+            total_time = 1e-6
+
+        entry = self.entry
+        entry["total_bytes"] = self.total_bytes
+        entry["last_ts"] = self.last_ts
+        entry["avg_mbps"] = (self.total_bytes / (1024 * 1024)) / total_time
+        entry["instant_mbps"] = self.instant_mbps
+        entry["peak_mbps"] = self.peak_mbps
+        delta = self.total_bytes - self.served_published
+        FETCH_STATS["bytes_served"] += delta
+        BYTES_SERVED.inc(delta)
+        if self.usage_token:
+            usage_aggregator.add(self.usage_token, delta)
+        self.served_published = self.total_bytes
+        self.published_at = self.last_ts
+
+
+def file_id_store_key(client: Client) -> str:
+    # file ids are only valid for the bot that resolved them
+    me = getattr(client, "me", None)
+    return str(getattr(me, "id", None) or client.name)
+
+
+async def resolve_file_id(client: Client, chat_id: int, message_id: int, use_store: bool = True) -> FileId:
+    file_id = None
+    if use_store:
+        file_id = await file_id_store.get(file_id_store_key(client), chat_id, message_id)
+
+    if file_id is None:
+        file_id = await get_file_ids(client, chat_id, message_id)
+        if not file_id:
+            LOGGER.warning("Message %s not found", message_id)
+            raise FIleNotFound
+        await file_id_store.put(file_id_store_key(client), chat_id, message_id, file_id)
+
+    setattr(file_id, 'message_ref', (chat_id, message_id))
+    return file_id
+
+
 class ByteStreamer:
     CHUNK_SIZE = 1024 * 1024  # 1 MB
-    CLEAN_INTERVAL = 30 * 60  # 30 minutes
+    COALESCE_BYTES = 64 * 1024
+    LEAD_BYTES = 64 * 1024  # size of the first request of a range, for a quick first byte
+    FILE_ID_CACHE_SIZE = 4096
+    FILE_ID_TTL = 30 * 60  # 30 minutes
+    FILE_ID_STALE_TTL = 30 * 60  # served while a refresh runs in the background
+    POOL_CHECK_INTERVAL = 60
+    INDEXED_MEDIA_SIZE = 4096
+    INDEX_MAX_BYTES = 64 * 1024 * 1024
+    INDEX_PARALLEL = 4
+    INDEX_BACKOFF = 0.05
+    FETCH_ATTEMPTS = 4  # per chunk on one target
+    SESSION_FAILOVER = 2  # failures on one media session before the chunk moves elsewhere
+    MAX_FAILOVERS = 3
 
     def __init__(self, client: Client):
         self.client = client
-        self._file_id_cache: Dict[int, FileId] = {}
+        self._file_id_cache = FileIdCache(self.FILE_ID_CACHE_SIZE, self.FILE_ID_TTL, self.FILE_ID_STALE_TTL)
         self._session_lock = asyncio.Lock()
-        asyncio.create_task(self._clean_cache())
+        self._session_pools: Dict[int, MediaSessionPool] = {}
         asyncio.create_task(self._prewarm_sessions())
+        asyncio.create_task(self._maintain_session_pools())
 
     async def _prewarm_sessions(self):
         common_dcs = [1, 2, 4, 5]  # Main Telegram DCs
         LOGGER.debug("Pre-warming media sessions for common DCs...")
-        
+
         for dc in common_dcs:
             try:
                 if dc in self.client.media_sessions:
                     LOGGER.debug(f"Media session for DC {dc} already exists, skipping")
                     continue
 
-                test_mode = await self.client.storage.test_mode()
                 current_dc = await self.client.storage.dc_id()
- 
                 if dc == current_dc:
                     continue
-                
-                auth_key = await Auth(self.client, dc, test_mode).create()
-                session = Session(self.client, dc, auth_key, test_mode, is_media=True)
-                session.no_updates = True
-                session.timeout = 30
-                session.sleep_threshold = 60
-                
-                await session.start()
-                
-                for attempt in range(6):
-                    try:
-                        exported = await self.client.invoke(
-                            raw.functions.auth.ExportAuthorization(dc_id=dc)
-                        )
-                        await session.send(
-                            raw.functions.auth.ImportAuthorization(
-                                id=exported.id, bytes=exported.bytes
-                            )
-                        )
-                        break
-                    except AuthBytesInvalid:
-                        LOGGER.debug(f"AuthBytesInvalid during pre-warm for DC {dc}; retrying...")
-                        await asyncio.sleep(0.5)
-                    except OSError:
-                        LOGGER.debug(f"OSError during pre-warm for DC {dc}; retrying...")
-                        await asyncio.sleep(1)
-                    except Exception as e:
-                        LOGGER.debug(f"Error during pre-warm for DC {dc}: {e}")
-                        break
-                
-                self.client.media_sessions[dc] = session
+
+                await self._get_session_pool(dc)
                 LOGGER.debug(f"Pre-warmed media session for DC {dc}")
-                
+
             except Exception as e:
                 LOGGER.debug(f"Could not pre-warm DC {dc}: {e}")
                 continue
 
     async def get_file_properties(self, chat_id: int, message_id: int) -> FileId:
-        if message_id not in self._file_id_cache:
-            file_id = await get_file_ids(self.client, int(chat_id), int(message_id))
-            if not file_id:
-                LOGGER.warning("Message %s not found", message_id)
-                raise FIleNotFound
-            self._file_id_cache[message_id] = file_id
-        return self._file_id_cache[message_id]
+        return await self._file_id_cache.get((int(chat_id), int(message_id)), self._resolve_file_id)
+
+    def peek_file_id(self, chat_id: int, message_id: int) -> Optional[FileId]:
+        return self._file_id_cache.peek((int(chat_id), int(message_id)))
+
+    @property
+    def _store_key(self) -> str:
+        return file_id_store_key(self.client)
+
+    async def _resolve_file_id(self, key: Tuple[int, int]) -> FileId:
+        # cold lookup after a restart; background refreshes always ask Telegram
+        return await resolve_file_id(self.client, *key, use_store=self._file_id_cache.peek(key) is None)
+
+    async def forget_file_id(self, file_id: FileId) -> None:
+        key = getattr(file_id, 'message_ref', None)
+        if not key:
+            return
+        self._file_id_cache.invalidate(key)
+        await file_id_store.delete(self._store_key, *key)
+
+    async def refresh_file_id(self, file_id: FileId) -> FileId:
+        # one re-resolve per message, however many chunks ran into the expired reference
+        key = getattr(file_id, 'message_ref', None)
+        if not key:
+            raise FIleNotFound
+        current = self._file_id_cache.peek(key)
+        if current is not None and current.file_reference != file_id.file_reference:
+            return current
+
+        refresh_key = (self._store_key, *key)
+        task = REFRESHING_FILE_IDS.get(refresh_key)
+        if task is None:
+            task = asyncio.create_task(self._refresh_file_id(file_id))
+            REFRESHING_FILE_IDS[refresh_key] = task
+            task.add_done_callback(lambda t: _release_inflight(refresh_key, t, REFRESHING_FILE_IDS))
+        return await asyncio.shield(task)
+
+    async def _refresh_file_id(self, file_id: FileId) -> FileId:
+        await self.forget_file_id(file_id)
+        fresh = await self.get_file_properties(*file_id.message_ref)
+        FETCH_STATS["reference_refreshes"] += 1
+        REFERENCE_REFRESHES.inc()
+        LOGGER.info(f"Refreshed expired file reference of message {file_id.message_ref[1]}")
+        return fresh
 
     async def prefetch_stream(
         self,
         file_id: FileId,
         client_index: int,
-        offset: int,
-        first_part_cut: int,
-        last_part_cut: int,
-        part_count: int,
-        chunk_size: int,
+        parts: RangePlan,
         prefetch: int = 3,
         stream_id: Optional[str] = None,
         meta: Optional[dict] = None,
         parallelism: int = 2,
         request: Optional[Request] = None,
+        stripe: Optional[list] = None,
+        throttle: Optional[TokenBucket] = None,
+        usage_token: Optional[str] = None,
+        failover: Optional[Callable[[Set[int]], Awaitable[Optional[tuple]]]] = None,
     ):
         if not stream_id:
             stream_id = secrets.token_hex(8)
 
         now = time.time()
+        chat_id, msg_id = getattr(file_id, "message_ref", (None, None))
         registry_entry = {
             "stream_id": stream_id,
-            "msg_id": getattr(file_id, "local_id", None) or None,
-            "chat_id": getattr(file_id, "chat_id", None),
+            "msg_id": msg_id,
+            "chat_id": chat_id,
             "dc_id": file_id.dc_id,
             "client_index": client_index,
             "start_ts": now,
@@ -122,71 +282,326 @@ class ByteStreamer:
             "peak_mbps": 0.0,
             "recent_measurements": deque(maxlen=3),
             "status": "active",
-            "part_count": part_count,
+            "part_count": len(parts),
             "prefetch": prefetch,
             "meta": meta or {},
+            "failover_count": 0,
+            "failovers": deque(maxlen=32),
         }
 
+        controller = ParallelismController(
+            initial=parallelism,
+            adaptive=Telegram.ADAPTIVE_PARALLEL,
+            max_window=Telegram.MAX_PARALLEL if Telegram.ADAPTIVE_PARALLEL else parallelism,
+        )
+        registry_entry["parallelism"] = controller.state
+        timeline = stream_timelines.start(
+            stream_id, now, forced=bool(request and request.headers.get("x-stream-trace"))
+        )
+        registry_entry["traced"] = timeline is not None
+        # in-range bytes handed to the producer, to tell how much a disconnect threw away
+        received = {"bytes": 0, "network": 0}
+
         ACTIVE_STREAMS[stream_id] = registry_entry
         work_loads[client_index] += 1
 
+        first_key = (file_id.media_id, parts.first_block * self.CHUNK_SIZE)
+        if parts.lead is not None and (chunk_cache.contains(first_key) or disk_chunk_cache.contains(first_key)):
+            # the first block is already cached, a lead request would only add work
+            parts.drop_lead()
+
         queue_maxsize = max(1, prefetch)
         q: asyncio.Queue = asyncio.Queue(maxsize=queue_maxsize)
         stop_event = asyncio.Event()
 
-        media_session = await self._get_media_session(file_id)
+        session_pool = await self._get_session_pool(file_id.dc_id)
         location = await self._get_location(file_id)
 
-        async def fetch_chunk_with_retries(seq_idx: int, off: int) -> Tuple[int, Optional[bytes]]:
+        lanes = [{
+            "client_index": client_index, "pool": session_pool, "location": location,
+            "streamer": self, "file_id": file_id, "inflight": 0, "chunks": 0, "errors": 0,
+        }]
+        lane_lock = asyncio.Lock()
+
+        async def add_lane(lane_index: int, lane_streamer: "ByteStreamer", lane_file_id: FileId) -> dict:
+            lane = {
+                "client_index": lane_index,
+                "pool": await lane_streamer._get_session_pool(lane_file_id.dc_id),
+                "location": await lane_streamer._get_location(lane_file_id),
+                "streamer": lane_streamer,
+                "file_id": lane_file_id,
+                "inflight": 0,
+                "chunks": 0,
+                "errors": 0,
+            }
+            lanes.append(lane)
+            work_loads[lane_index] += 1
+            registry_entry["stripe"] = [
+                {"client_index": lane["client_index"], "chunks": lane["chunks"]} for lane in lanes
+            ]
+            return lane
+
+        registry_entry["stripe"] = []
+        for lane_index, lane_streamer, lane_file_id in stripe or []:
+            try:
+                await add_lane(lane_index, lane_streamer, lane_file_id)
+            except Exception as e:
+                LOGGER.warning(f"Stream {stream_id}: client {lane_index} dropped from stripe: {e}")
+
+        def pick_lane() -> int:
+            if len(lanes) == 1:
+                return 0
+            # lanes whose client sits out a FloodWait and lanes a chunk recently failed over from
+            # come last, then the least outstanding requests relative to the client's share of the load
+            now = time.time()
+            return min(
+                range(len(lanes)),
+                key=lambda i: (
+                    client_health.in_cooldown(lanes[i]["client_index"], now),
+                    lanes[i]["errors"],
+                    (lanes[i]["inflight"] + 1) * (1 + work_loads.get(lanes[i]["client_index"], 0)),
+                ),
+            )
+
+        async def failover_target(lane_idx: int, abandoned: list, flooded: bool = False):
+            # another session of the same client first, then another client that can reach the file.
+            # A FloodWait holds for the whole client, so its other sessions are no way out.
+            if not flooded and not client_health.in_cooldown(lanes[lane_idx]["client_index"]):
+                member = await lanes[lane_idx]["pool"].acquire_other(abandoned)
+                if member is not None:
+                    return lane_idx, member
+            lanes[lane_idx]["errors"] += 1
+
+            async with lane_lock:
+                others = [i for i in range(len(lanes)) if i != lane_idx]
+                cooling = [i for i in others if client_health.in_cooldown(lanes[i]["client_index"])]
+                for idx in sorted((i for i in others if i not in cooling), key=lambda i: lanes[i]["errors"]):
+                    member = await lanes[idx]["pool"].acquire_other(abandoned)
+                    if member is not None:
+                        return idx, member
+
+                if failover is not None:
+                    try:
+                        extra = await failover({lane["client_index"] for lane in lanes})
+                        if extra is not None:
+                            lane = await add_lane(*extra)
+                            return len(lanes) - 1, lane["pool"].acquire()
+                    except Exception as e:
+                        LOGGER.debug(f"Stream {stream_id}: no client to fail over to: {e}")
+
+                # lanes still cooling down only when nothing else can take the chunk
+                for idx in sorted(cooling, key=lambda i: client_health.cooldown(lanes[i]["client_index"])):
+                    member = await lanes[idx]["pool"].acquire_other(abandoned)
+                    if member is not None:
+                        return idx, member
+                return None
+
+        async def refresh_lane(lane: dict, expired: FileId) -> bool:
+            # swap in a fresh reference for every later request of this lane
+            try:
+                fresh = await lane["streamer"].refresh_file_id(expired)
+            except Exception as e:
+                LOGGER.warning(f"Stream {stream_id}: could not refresh file reference: {e}")
+                return False
+            if lane["file_id"] is expired:
+                lane["file_id"] = fresh
+                lane["location"] = await lane["streamer"]._get_location(fresh)
+                registry_entry["reference_refreshes"] = registry_entry.get("reference_refreshes", 0) + 1
+            return True
+
+        def record_failover(seq_idx: int, off: int, old: dict, old_member, new: dict, new_member, error) -> None:
+            kind = "session" if old is new else "client"
+            CHUNK_FAILOVERS.labels(kind).inc()
+            registry_entry["failover_count"] += 1
+            registry_entry["failovers"].append({
+                "ts": time.time(),
+                "seq": seq_idx,
+                "offset": off,
+                "kind": kind,
+                "from_client": old["client_index"],
+                "from_session": old_member.id,
+                "to_client": new["client_index"],
+                "to_session": new_member.id,
+                "error": type(error).__name__,
+            })
+            LOGGER.info(
+                f"Stream {stream_id}: chunk at {off} moved from client {old['client_index']} session "
+                f"{old_member.id} to client {new['client_index']} session {new_member.id} after {error!r}"
+            )
+
+        async def fetch_chunk_with_retries(seq_idx: int, part: FilePart) -> Tuple[int, Optional[bytes]]:
+            off, limit = part.offset, part.limit
+            full = limit == self.CHUNK_SIZE
+            cache_key = (file_id.media_id, off) if full else (file_id.media_id, off, limit)
+            cached = await self._get_cached_chunk(cache_key)
+            if cached is None and not full:
+                # a cached full block also serves every smaller request inside it
+                base = off - off % self.CHUNK_SIZE
+                block = await self._get_cached_chunk((file_id.media_id, base))
+                if block is not None:
+                    cached = memoryview(block)[off - base:off - base + limit]
+            event = timeline.event(seq_idx) if timeline else None
+            if cached is not None:
+                received["bytes"] += part.cut_end - part.cut_start
+                if event:
+                    event.cached = True
+                    event.received = time.time()
+                return seq_idx, cached
+
+            lane_idx = pick_lane()
+            lane = lanes[lane_idx]
+            member = None
+            abandoned = []
             tries = 0
-            while tries < 4 and not stop_event.is_set():
+            session_failures = 0
+            failovers = 0
+            while tries < self.FETCH_ATTEMPTS and not stop_event.is_set():
+                if member is None:
+                    member = lane["pool"].acquire()
+                lane["inflight"] += 1
+                ok = False
+                used_file_id = lane["file_id"]
                 try:
-                    r = await media_session.send(
-                        raw.functions.upload.GetFile(location=location, offset=off, limit=chunk_size)
+                    started = time.time()
+                    if event:
+                        event.sent = started
+                        event.client_index = lane["client_index"]
+                        event.session = member.id
+                    chunk_bytes = await self._request_chunk(
+                        member.session, lane["location"], cache_key, off, limit, lane["client_index"]
                     )
-                    chunk_bytes = getattr(r, "bytes", None) if r else None
+                    ok = True
+                    if event:
+                        event.received = time.time()
+                    if full:
+                        # small edge requests would make every full block look congested
+                        controller.on_chunk(time.time() - started, registry_entry["instant_mbps"])
+                    lane["errors"] = 0
+                    if registry_entry["stripe"]:
+                        lane["chunks"] += 1
+                        registry_entry["stripe"][lane_idx]["chunks"] = lane["chunks"]
+                    received["bytes"] += part.cut_end - part.cut_start
+                    received["network"] += part.cut_end - part.cut_start
                     return seq_idx, chunk_bytes
+                except (FileReferenceExpired, FileReferenceInvalid, CoalescedFetchFailed) as e:
+                    # a stale reference or a shared request that failed elsewhere, not this session's fault:
+                    # retry right away
+                    tries += 1
+                    error = e
+                    ok = True
+                    if event:
+                        event.retries += 1
+                except FloodWait as e:
+                    # the client is told to wait, the session itself is fine
+                    tries += 1
+                    error = e
+                    ok = True
+                    controller.on_error()
+                    if event:
+                        event.retries += 1
                 except Exception as e:
                     tries += 1
+                    session_failures += 1
+                    error = e
+                    controller.on_error()
                     LOGGER.debug(
                         "Fetch chunk error seq=%s off=%s try=%s err=%s",
                         seq_idx, off, tries, getattr(e, "args", e),
                     )
-                    await asyncio.sleep(0.15 * tries)
-            
+                    if event:
+                        event.retries += 1
+                finally:
+                    lane["inflight"] -= 1
+                    lane["pool"].release(member, ok)
+
+                failed, member = member, None
+                if isinstance(error, CoalescedFetchFailed):
+                    # the shared request is gone, the next attempt sends its own on this lane
+                    CHUNK_RETRIES.inc()
+                    continue
+                if isinstance(error, (FileReferenceExpired, FileReferenceInvalid)):
+                    if await refresh_lane(lane, used_file_id):
+                        CHUNK_RETRIES.inc()
+                        continue
+                flooded = isinstance(error, FloodWait)
+                if (
+                    (flooded or session_failures >= self.SESSION_FAILOVER)
+                    and failovers < self.MAX_FAILOVERS
+                    and not stop_event.is_set()
+                ):
+                    abandoned.append(failed)
+                    target = await failover_target(lane_idx, abandoned, flooded)
+                    if target is not None:
+                        old_lane = lane
+                        lane_idx, member = target
+                        lane = lanes[lane_idx]
+                        record_failover(seq_idx, off, old_lane, failed, lane, member, error)
+                        failovers += 1
+                        session_failures = 0
+                        # the new target gets a fresh budget
+                        tries = 0
+                        CHUNK_RETRIES.inc()
+                        continue
+
+                if tries < self.FETCH_ATTEMPTS:
+                    CHUNK_RETRIES.inc()
+                    if flooded:
+                        # nowhere else to go, asking again before the wait is over only earns another FloodWait
+                        try:
+                            await asyncio.wait_for(stop_event.wait(), client_health.cooldown(lane["client_index"]))
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await asyncio.sleep(0.15 * tries)
+
+            if member is not None:
+                # stopped right after a failover picked the next session
+                lane["pool"].release(member, True)
+
             LOGGER.error("Failed to fetch chunk seq=%s off=%s after retries", seq_idx, off)
+            if event:
+                event.failed = True
             return seq_idx, None
 
         async def producer():
             try:
+                part_count = len(parts)
                 if part_count <= 0:
                     await q.put((None, None))
                     return
 
                 next_to_schedule = 0
                 scheduled_tasks = {}
+                scheduled_parts = {}
                 results_buffer = {}
                 next_to_put = 0
-                max_parallel = max(1, parallelism)
 
-                initial = min(part_count, max_parallel)
-                for i in range(initial):
+                def schedule_next(counted: bool = True):
+                    nonlocal next_to_schedule
                     seq = next_to_schedule
-                    off = offset + seq * chunk_size
-                    task = asyncio.create_task(fetch_chunk_with_retries(seq, off))
+                    part = scheduled_parts[seq] = parts[seq]
+                    if timeline:
+                        timeline.scheduled(seq, part.offset, part.limit)
+                    task = asyncio.create_task(fetch_chunk_with_retries(seq, part))
+                    if counted:
+                        controller.started()
+                        task.add_done_callback(lambda _: controller.finished())
                     scheduled_tasks[seq] = task
                     next_to_schedule += 1
 
+                if parts.lead is not None:
+                    # the lead request sits outside the window so it never holds back the first block
+                    schedule_next(counted=False)
+
                 while next_to_put < part_count:
                     if stop_event.is_set():
                         break
 
+                    while next_to_schedule < part_count and controller.can_schedule():
+                        schedule_next()
+
                     if not scheduled_tasks:
-                        seq = next_to_schedule
-                        off = offset + seq * chunk_size
-                        task = asyncio.create_task(fetch_chunk_with_retries(seq, off))
-                        scheduled_tasks[seq] = task
-                        next_to_schedule += 1
+                        schedule_next()
 
                     done, _ = await asyncio.wait(scheduled_tasks.values(), return_when=asyncio.FIRST_COMPLETED)
 
@@ -211,13 +626,6 @@ class ByteStreamer:
 
                             results_buffer[seq_idx] = chunk_bytes
 
-                            if next_to_schedule < part_count:
-                                seq = next_to_schedule
-                                off = offset + seq * chunk_size
-                                task = asyncio.create_task(fetch_chunk_with_retries(seq, off))
-                                scheduled_tasks[seq] = task
-                                next_to_schedule += 1
-
                         except asyncio.CancelledError:
                             raise
                         except Exception as e:
@@ -227,7 +635,9 @@ class ByteStreamer:
 
                     while next_to_put in results_buffer:
                         chunk_bytes = results_buffer.pop(next_to_put)
-                        await q.put((offset + next_to_put * chunk_size, chunk_bytes))
+                        await q.put((scheduled_parts.pop(next_to_put), chunk_bytes))
+                        if timeline:
+                            timeline.enqueued(next_to_put)
                         next_to_put += 1
 
                 await q.put((None, None))
@@ -248,14 +658,16 @@ class ByteStreamer:
 
         async def consumer_generator():
             producer_task = asyncio.create_task(producer())
-            current_part_idx = 1
+            stats = StreamStats(registry_entry, usage_token)
+            pending = []
+            pending_len = 0
 
             try:
                 while True:
                     try:
                         if request and await request.is_disconnected():
                             LOGGER.debug("Client disconnected for stream %s; cancelling stream", stream_id)
-                            ACTIVE_STREAMS[stream_id]["status"] = "cancelled"
+                            registry_entry["status"] = "cancelled"
                             break
                     except Exception:
                         pass
@@ -264,67 +676,66 @@ class ByteStreamer:
                     if off_chunk is None:
                         break
 
-                    off, chunk = off_chunk
-                    if off is None and chunk is None:
+                    part, chunk = off_chunk
+                    if part is None and chunk is None:
                         break
+                    if timeline:
+                        timeline.dequeued()
 
-                    try:
-                        chunk_len = len(chunk)
-                    except Exception:
-                        chunk_len = 0
-
-                    now_ts = time.time()
-                    elapsed = now_ts - ACTIVE_STREAMS[stream_id]["last_ts"]
-                    if elapsed <= 0:
-                        elapsed = 1e-6
-
-                    recent = ACTIVE_STREAMS[stream_id]["recent_measurements"]
-                    recent.append((chunk_len, elapsed))
-
-                    if len(recent) >= 2:
-                        total_bytes = sum(b for b, _ in recent)
-                        total_time = sum(t for _, t in recent)
-                        instant_mbps = min((total_bytes / (1024 * 1024)) / max(total_time, 0.01), 1000.0)
+                    # edge cuts are views into the chunk, not copies of it
+                    if part.cut_start == 0 and part.cut_end >= len(chunk):
+                        piece = chunk
                     else:
-                        instant_mbps = 0.0
-
-                    ACTIVE_STREAMS[stream_id]["total_bytes"] += chunk_len
-                    ACTIVE_STREAMS[stream_id]["last_ts"] = now_ts
+                        piece = memoryview(chunk)[part.cut_start:part.cut_end]
 
-                    total_time = now_ts - ACTIVE_STREAMS[stream_id]["start_ts"]
-                    if total_time <= 0:
-                        total_time = 1e-6
+                    piece_len = len(piece)
+                    stats.record(piece_len)
 
-                    ACTIVE_STREAMS[stream_id]["avg_mbps"] = (ACTIVE_STREAMS[stream_id]["total_bytes"] / (1024 * 1024)) / total_time
-                    ACTIVE_STREAMS[stream_id]["instant_mbps"] = instant_mbps
+                    if piece_len < self.COALESCE_BYTES:
+                        # small tail pieces are merged so the ASGI server sees fewer sends
+                        pending.append(piece)
+                        pending_len += piece_len
+                        if pending_len < self.COALESCE_BYTES:
+                            continue
+                        piece = b"".join(pending)
+                        pending.clear()
+                        pending_len = 0
+                    elif pending:
+                        if throttle:
+                            await throttle.consume(pending_len)
+                        if timeline:
+                            timeline.yielded()
+                        yield b"".join(pending)
+                        pending.clear()
+                        pending_len = 0
 
-                    if instant_mbps > ACTIVE_STREAMS[stream_id]["peak_mbps"]:
-                        ACTIVE_STREAMS[stream_id]["peak_mbps"] = instant_mbps
-
-                    if part_count == 1:
-                        yield chunk[first_part_cut:last_part_cut]
-                    elif current_part_idx == 1:
-                        yield chunk[first_part_cut:]
-                    elif current_part_idx == part_count:
-                        yield chunk[:last_part_cut]
-                    else:
-                        yield chunk
+                    if throttle:
+                        await throttle.consume(len(piece))
+                    if timeline:
+                        timeline.yielded()
+                    yield piece
 
-                    current_part_idx += 1
+                if pending:
+                    if throttle:
+                        await throttle.consume(pending_len)
+                    if timeline:
+                        timeline.yielded()
+                    yield b"".join(pending)
 
             except asyncio.CancelledError:
                 LOGGER.debug("Consumer cancelled for stream %s", stream_id)
                 if not producer_task.done():
                     producer_task.cancel()
-                ACTIVE_STREAMS[stream_id]["status"] = "cancelled"
+                registry_entry["status"] = "cancelled"
                 raise
             except Exception as e:
                 LOGGER.exception("Consumer error for stream %s: %s", stream_id, e)
-                ACTIVE_STREAMS[stream_id]["status"] = "error"
+                registry_entry["status"] = "error"
                 if not producer_task.done():
                     producer_task.cancel()
                 raise
             finally:
+                stats.publish()
                 if not producer_task.done():
                     try:
                         producer_task.cancel()
@@ -334,10 +745,13 @@ class ByteStreamer:
 
                 try:
                     end_ts = time.time()
-                    total_bytes = ACTIVE_STREAMS[stream_id]["total_bytes"]
-                    start_ts = ACTIVE_STREAMS[stream_id]["start_ts"]
+                    total_bytes = registry_entry["total_bytes"]
+                    start_ts = registry_entry["start_ts"]
                     duration = end_ts - start_ts if end_ts > start_ts else 0.0
                     avg_mbps = (total_bytes / (1024 * 1024)) / (duration if duration > 0 else 1e-6)
+                    STREAM_DURATION.observe(duration)
+                    if registry_entry["status"] == "cancelled":
+                        WASTED_BYTES.inc(min(received["network"], max(0, received["bytes"] - total_bytes)))
 
                     entry = ACTIVE_STREAMS.get(stream_id, {})
                     entry.update({
@@ -345,7 +759,7 @@ class ByteStreamer:
                         "duration": duration,
                         "avg_mbps": avg_mbps,
                         "status": entry.get("status", "finished"),
-                        "parallelism": parallelism,
+                        "parallelism": controller.state,
                     })
 
                     try:
@@ -353,58 +767,240 @@ class ByteStreamer:
                     except KeyError:
                         pass
                 finally:
-                    try:
-                        work_loads[client_index] -= 1
-                    except Exception:
-                        pass
+                    for lane in lanes:
+                        try:
+                            work_loads[lane["client_index"]] -= 1
+                        except Exception:
+                            pass
 
                 stop_event.set()
 
         return consumer_generator()
 
+    def prefetch_container_index(self, file_id: FileId, client_index: int) -> None:
+        if not Telegram.INDEX_PREFETCH or file_id.file_size <= 2 * self.CHUNK_SIZE:
+            return
+        if not (chunk_cache.enabled or disk_chunk_cache.enabled):
+            # with nowhere to keep them, the warmed chunks would be thrown away
+            return
+        if file_id.media_id in INDEXED_MEDIA:
+            INDEXED_MEDIA.move_to_end(file_id.media_id)
+            return
+        INDEXED_MEDIA[file_id.media_id] = time.time()
+        while len(INDEXED_MEDIA) > self.INDEXED_MEDIA_SIZE:
+            INDEXED_MEDIA.popitem(last=False)
+        _background(self._prefetch_container_index(file_id, client_index), f"seek index prefetch of {file_id.media_id}")
+
+    async def _prefetch_container_index(self, file_id: FileId, client_index: int) -> None:
+        chunk_size = self.CHUNK_SIZE
+        file_size = file_id.file_size
+        try:
+            pool = await self._get_session_pool(file_id.dc_id)
+            location = await self._get_location(file_id)
+
+            async def fetch(off: int):
+                cache_key = (file_id.media_id, off)
+                cached = await self._get_cached_chunk(cache_key)
+                if cached is not None:
+                    return cached
+                # background work: counts against the process-wide budget and waits while streams use it up
+                while GLOBAL_INFLIGHT["count"] >= Telegram.GLOBAL_MAX_INFLIGHT:
+                    await asyncio.sleep(self.INDEX_BACKOFF)
+                GLOBAL_INFLIGHT["count"] += 1
+                member = pool.acquire()
+                ok = False
+                try:
+                    chunk_bytes = await self._request_chunk(
+                        member.session, location, cache_key, off, chunk_size, client_index
+                    )
+                    ok = True
+                    return chunk_bytes or b""
+                except CoalescedFetchFailed:
+                    ok = True
+                    raise
+                finally:
+                    pool.release(member, ok)
+                    GLOBAL_INFLIGHT["count"] -= 1
+
+            async def read(offset: int, length: int) -> bytes:
+                first = offset - offset % chunk_size
+                chunks = []
+                off = first
+                while off < min(offset + length, file_size):
+                    chunks.append(await fetch(off))
+                    off += chunk_size
+                data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+                return bytes(data[offset - first:offset - first + length])
+
+            ranges = await index_ranges(read, file_size)
+            offsets = set()
+            for start, end in ranges:
+                if end - start + 1 > self.INDEX_MAX_BYTES:
+                    LOGGER.debug(f"Seek index of media {file_id.media_id} is {end - start + 1} bytes, not prefetched")
+                    continue
+                offsets.update(range(start - start % chunk_size, end + 1, chunk_size))
+                INDEX_STATS["ranges"] += 1
+                INDEX_STATS["bytes"] += end - start + 1
+
+            limiter = asyncio.Semaphore(self.INDEX_PARALLEL)
+
+            async def warm(off: int) -> None:
+                async with limiter:
+                    await fetch(off)
+
+            await asyncio.gather(*(warm(off) for off in sorted(offsets)))
+            INDEX_STATS["files"] += 1
+            LOGGER.debug(f"Prefetched seek index of media {file_id.media_id}: {ranges}")
+        except Exception as e:
+            INDEX_STATS["errors"] += 1
+            # allow another attempt on the next open
+            INDEXED_MEDIA.pop(file_id.media_id, None)
+            LOGGER.debug(f"Seek index prefetch failed for media {file_id.media_id}: {e}")
+
+    @staticmethod
+    async def _get_cached_chunk(cache_key: Tuple[int, int]):
+        if chunk_cache.enabled:
+            cached = chunk_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if disk_chunk_cache.enabled:
+            return await disk_chunk_cache.get(cache_key)
+        return None
+
+    async def _request_chunk(
+        self,
+        media_session: Session,
+        location,
+        cache_key: Tuple[int, int],
+        offset: int,
+        limit: int,
+        client_index: int,
+    ) -> Optional[bytes]:
+        task = INFLIGHT_CHUNKS.get(cache_key)
+        owner = task is None
+        if owner:
+            task = asyncio.create_task(
+                self._send_get_file(media_session, location, cache_key, offset, limit, client_index)
+            )
+            INFLIGHT_CHUNKS[cache_key] = task
+            task.add_done_callback(lambda t: _release_inflight(cache_key, t))
+        else:
+            FETCH_STATS["coalesced"] += 1
+
+        try:
+            # shielded so a waiter going away does not cancel the request for the others
+            return await asyncio.shield(task)
+        except Exception as e:
+            if owner:
+                raise
+            # the request ran on another session, maybe of another client: not this caller's failure
+            raise CoalescedFetchFailed(e) from e
+
+    @staticmethod
+    async def _send_get_file(
+        media_session: Session,
+        location,
+        cache_key: Tuple[int, int],
+        offset: int,
+        limit: int,
+        client_index: int,
+    ) -> Optional[bytes]:
+        FETCH_STATS["requests"] += 1
+        client_health.request_started(client_index, limit)
+        started = time.time()
+        try:
+            r = await media_session.send(
+                raw.functions.upload.GetFile(location=location, offset=offset, limit=limit)
+            )
+        except FloodWait as e:
+            client_health.record_flood_wait(client_index, e.value)
+            raise
+        finally:
+            client_health.request_finished(client_index, limit)
+        elapsed = time.time() - started
+        CHUNK_LATENCY.labels(media_session.dc_id, client_index).observe(elapsed)
+        if limit == ByteStreamer.CHUNK_SIZE:
+            client_health.record_latency(client_index, media_session.dc_id, elapsed)
+
+        chunk_bytes = getattr(r, "bytes", None) if r else None
+        if chunk_bytes:
+            FETCH_STATS["bytes_fetched"] += len(chunk_bytes)
+            CHUNKS_FETCHED.labels(media_session.dc_id).inc()
+            chunk_cache.put(cache_key, chunk_bytes)
+            # the disk cache only holds whole 1 MB blocks
+            if disk_chunk_cache.enabled and limit == ByteStreamer.CHUNK_SIZE:
+                _background(disk_chunk_cache.put(cache_key, chunk_bytes), f"disk cache write of {cache_key}")
+        return chunk_bytes
+
     async def _get_media_session(self, file_id: FileId) -> Session:
-        dc = file_id.dc_id
-        media_session = self.client.media_sessions.get(dc)
+        return (await self._get_session_pool(file_id.dc_id)).primary
 
-        if media_session:
-            return media_session
+    async def _get_session_pool(self, dc: int) -> MediaSessionPool:
+        pool = self._session_pools.get(dc)
+        if pool and pool.members:
+            return pool
 
         async with self._session_lock:
+            pool = self._session_pools.get(dc)
+            if pool and pool.members:
+                return pool
+
+            pool = MediaSessionPool(dc, self._create_media_session, Telegram.MEDIA_SESSIONS_PER_DC)
             media_session = self.client.media_sessions.get(dc)
-            if media_session:
-                return media_session
+            if not media_session:
+                media_session = await self._create_media_session(dc)
+                self.client.media_sessions[dc] = media_session
+                LOGGER.debug("Created media session for DC %s", dc)
 
-            test_mode = await self.client.storage.test_mode()
-            current_dc = await self.client.storage.dc_id()
+            pool.add(media_session, primary=True)
+            self._session_pools[dc] = pool
+            return pool
 
-            if dc != current_dc:
-                auth_key = await Auth(self.client, dc, test_mode).create()
-            else:
-                auth_key = await self.client.storage.auth_key()
+    async def _create_media_session(self, dc: int) -> Session:
+        test_mode = await self.client.storage.test_mode()
+        current_dc = await self.client.storage.dc_id()
 
-            session = Session(self.client, dc, auth_key, test_mode, is_media=True)
-            session.no_updates = True
-            session.timeout = 30 
-            session.sleep_threshold = 60 
+        if dc != current_dc:
+            auth_key = await Auth(self.client, dc, test_mode).create()
+        else:
+            auth_key = await self.client.storage.auth_key()
 
-            await session.start()
+        session = Session(self.client, dc, auth_key, test_mode, is_media=True)
+        session.no_updates = True
+        session.timeout = 30
+        session.sleep_threshold = 60
 
-            if dc != current_dc:
-                for _ in range(6):
-                    try:
-                        exported = await self.client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc))
-                        await session.send(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
-                        break
-                    except AuthBytesInvalid:
-                        LOGGER.debug("AuthBytesInvalid during media session import; retrying...")
-                        await asyncio.sleep(0.5)
-                    except OSError:
-                        LOGGER.debug("OSError during media session import; retrying...")
-                        await asyncio.sleep(1)
+        await session.start()
+
+        if dc != current_dc:
+            for _ in range(6):
+                try:
+                    exported = await self.client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc))
+                    await session.send(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
+                    break
+                except AuthBytesInvalid:
+                    LOGGER.debug("AuthBytesInvalid during media session import; retrying...")
+                    await asyncio.sleep(0.5)
+                except OSError:
+                    LOGGER.debug("OSError during media session import; retrying...")
+                    await asyncio.sleep(1)
 
-            self.client.media_sessions[dc] = session
-            LOGGER.debug("Created media session for DC %s", dc)
-            return session
+        return session
+
+    async def _maintain_session_pools(self) -> None:
+        while True:
+            await asyncio.sleep(self.POOL_CHECK_INTERVAL)
+            for pool in list(self._session_pools.values()):
+                try:
+                    await pool.maintain()
+                except Exception as e:
+                    LOGGER.debug(f"Media session pool check failed for DC {pool.dc_id}: {e}")
+
+    def file_id_cache_info(self) -> dict:
+        return self._file_id_cache.stats()
+
+    def session_pool_info(self) -> Dict[int, dict]:
+        return {dc: pool.info() for dc, pool in self._session_pools.items()}
 
     @staticmethod
     async def _get_location(file_id: FileId) -> Union[
@@ -445,9 +1041,3 @@ class ByteStreamer:
             file_reference=file_id.file_reference,
             thumb_size=file_id.thumbnail_size,
         )
-
-    async def _clean_cache(self) -> None:
-        while True:
-            await asyncio.sleep(self.CLEAN_INTERVAL)
-            self._file_id_cache.clear()
-            LOGGER.debug("ByteStreamer: cleared file_id cache")
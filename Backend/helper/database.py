@@ -5,7 +5,7 @@ from bson import ObjectId
 import motor.motor_asyncio
 from datetime import datetime, timezone
 from pydantic import ValidationError
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from typing import Dict, List, Optional, Tuple, Any
 
 from Backend.logger import LOGGER
@@ -14,6 +14,7 @@ import re
 from Backend.helper.encrypt import decode_string
 from Backend.helper.modal import Episode, MovieSchema, QualityDetail, Season, TVShowSchema
 from Backend.helper.task_manager import delete_message
+from Backend.helper.token_cache import token_cache
 
 
 def convert_objectid_to_str(document: Dict[str, Any]) -> Dict[str, Any]:
@@ -911,7 +912,14 @@ class Database:
     # API Token Methods
     # -------------------------------
 
-    async def add_api_token(self, name: str, daily_limit_gb: float = None, monthly_limit_gb: float = None) -> dict:
+    async def add_api_token(
+        self,
+        name: str,
+        daily_limit_gb: float = None,
+        monthly_limit_gb: float = None,
+        max_mbps: float = None,
+        max_streams: int = None,
+    ) -> dict:
         alphabet = string.ascii_letters + string.digits
         token = ''.join(secrets.choice(alphabet) for _ in range(32))
         
@@ -921,7 +929,9 @@ class Database:
             "created_at": datetime.utcnow(),
             "limits": {
                 "daily_limit_gb": daily_limit_gb if daily_limit_gb else 0,
-                "monthly_limit_gb": monthly_limit_gb if monthly_limit_gb else 0
+                "monthly_limit_gb": monthly_limit_gb if monthly_limit_gb else 0,
+                "max_mbps": max_mbps if max_mbps else 0,
+                "max_streams": max_streams if max_streams else 0
             },
             "usage": {
                 "total_bytes": 0,
@@ -931,6 +941,7 @@ class Database:
         }
         
         await self.dbs["tracking"]["api_tokens"].insert_one(token_doc)
+        token_cache.invalidate(token)
         return convert_objectid_to_str(token_doc)
 
     async def get_api_token(self, token: str) -> Optional[dict]:
@@ -944,49 +955,58 @@ class Database:
 
     async def revoke_api_token(self, token: str) -> bool:
         result = await self.dbs["tracking"]["api_tokens"].delete_one({"token": token})
+        token_cache.invalidate(token)
         return result.deleted_count > 0
 
-    async def update_token_usage(self, token: str, bytes_delta: int):
+    async def bulk_update_token_usage(self, deltas: Dict[str, int]):
         today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         month_str = datetime.now(timezone.utc).strftime("%Y-%m")
-        
-        token_doc = await self.dbs["tracking"]["api_tokens"].find_one({"token": token})
-        if not token_doc:
-             return
 
-        current_daily = token_doc.get("usage", {}).get("daily", {})
-        if current_daily.get("date") != today_str:
-            await self.dbs["tracking"]["api_tokens"].update_one(
-                {"token": token},
-                {"$set": {"usage.daily": {"date": today_str, "bytes": 0}}}
-            )
+        def counter(period: str, key: str, value: str, delta: int) -> dict:
+            # restarts the counter when the stored day or month is not the current one
+            return {
+                "$cond": [
+                    {"$eq": [f"$usage.{period}.{key}", value]},
+                    {key: value, "bytes": {"$add": [{"$ifNull": [f"$usage.{period}.bytes", 0]}, delta]}},
+                    {key: value, "bytes": delta},
+                ]
+            }
 
-        current_monthly = token_doc.get("usage", {}).get("monthly", {})
-        if current_monthly.get("month") != month_str:
-            await self.dbs["tracking"]["api_tokens"].update_one(
+        operations = [
+            UpdateOne(
                 {"token": token},
-                {"$set": {"usage.monthly": {"month": month_str, "bytes": 0}}}
+                [{"$set": {
+                    "usage.total_bytes": {"$add": [{"$ifNull": ["$usage.total_bytes", 0]}, delta]},
+                    "usage.daily": counter("daily", "date", today_str, delta),
+                    "usage.monthly": counter("monthly", "month", month_str, delta),
+                }}]
             )
+            for token, delta in deltas.items()
+            if delta > 0
+        ]
+        if operations:
+            await self.dbs["tracking"]["api_tokens"].bulk_write(operations, ordered=False)
 
-        await self.dbs["tracking"]["api_tokens"].update_one(
-            {"token": token},
-            {
-                "$inc": {
-                    "usage.total_bytes": bytes_delta,
-                    "usage.daily.bytes": bytes_delta,
-                    "usage.monthly.bytes": bytes_delta
-                }
-            }
-        )
-
-    async def update_api_token_limits(self, token: str, daily_limit_gb: float, monthly_limit_gb: float) -> bool:
+    async def update_api_token_limits(
+        self,
+        token: str,
+        daily_limit_gb: float,
+        monthly_limit_gb: float,
+        max_mbps: float = None,
+        max_streams: int = None,
+    ) -> bool:
+        limits = {
+            "limits.daily_limit_gb": daily_limit_gb if daily_limit_gb else 0,
+            "limits.monthly_limit_gb": monthly_limit_gb if monthly_limit_gb else 0,
+        }
+        # the stream limits are only touched when the caller sent them
+        if max_mbps is not None:
+            limits["limits.max_mbps"] = max_mbps
+        if max_streams is not None:
+            limits["limits.max_streams"] = max_streams
         result = await self.dbs["tracking"]["api_tokens"].update_one(
             {"token": token},
-            {"$set": {
-                "limits": {
-                    "daily_limit_gb": daily_limit_gb if daily_limit_gb else 0,
-                    "monthly_limit_gb": monthly_limit_gb if monthly_limit_gb else 0
-                }
-            }}
+            {"$set": limits}
         )
+        token_cache.invalidate(token)
         return result.modified_count > 0
@@ -3,4 +3,23 @@ class InvalidHash(Exception):
 
 
 class FIleNotFound(Exception):
-    message = 'File not found!'
\ No newline at end of file
+    message = 'File not found!'
+
+class StreamBusy(Exception):
+    message = 'Too many streams, try again later!'
+
+    def __init__(self, retry_after: int):
+        super().__init__(self.message)
+        self.retry_after = retry_after
+
+
+class StreamLimitExceeded(Exception):
+    message = 'Too many streams for this token!'
+
+
+class CoalescedFetchFailed(Exception):
+    message = 'A shared chunk request failed on another session!'
+
+    def __init__(self, error: BaseException):
+        super().__init__(self.message)
+        self.error = error
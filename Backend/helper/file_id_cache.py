@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from pyrogram.file_id import FileId
+
+from Backend.logger import LOGGER
+
+# (chat_id, msg_id)
+FileKey = Tuple[int, int]
+Loader = Callable[[FileKey], Awaitable[FileId]]
+
+
+class FileIdCache:
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[FileKey, Tuple[FileId, float]]" = OrderedDict()
+        self._loading: Dict[FileKey, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    async def get(self, key: FileKey, loader: Loader) -> FileId:
+        entry = self._entries.get(key)
+        if entry is not None:
+            file_id, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return file_id
+            if age < self.ttl + self.stale_ttl:
+                # serve the old value and refresh it in the background
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._loading:
+                    self.refreshes += 1
+                    self._start_load(key, loader, refresh=True)
+                return file_id
+            self._entries.pop(key, None)
+
+        self.misses += 1
+        task = self._loading.get(key) or self._start_load(key, loader)
+        return await asyncio.shield(task)
+
+    def _start_load(self, key: FileKey, loader: Loader, refresh: bool = False) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader))
+        self._loading[key] = task
+        task.add_done_callback(lambda t: self._loaded(t, refresh))
+        return task
+
+    async def _load(self, key: FileKey, loader: Loader) -> FileId:
+        try:
+            file_id = await loader(key)
+            self.put(key, file_id)
+            return file_id
+        finally:
+            self._loading.pop(key, None)
+
+    def _loaded(self, task: asyncio.Task, refresh: bool) -> None:
+        if task.cancelled():
+            return
+        # always retrieve the error, the waiters may all have gone away
+        error = task.exception()
+        if error is not None and refresh:
+            self.refresh_errors += 1
+            LOGGER.debug(f"FileId background refresh failed: {error}")
+
+    def peek(self, key: FileKey) -> Optional[FileId]:
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry[1] >= self.ttl + self.stale_ttl:
+            return None
+        return entry[0]
+
+    def put(self, key: FileKey, file_id: FileId) -> None:
+        self._entries[key] = (file_id, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: FileKey) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from pyrogram.file_id import FileId
+
+from Backend.config import Telegram
+from Backend.logger import LOGGER
+
+
+class FileIdStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # opened on first use so startup does not wait on the disk
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS file_ids (
+                    client TEXT NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    msg_id INTEGER NOT NULL,
+                    file_id TEXT NOT NULL,
+                    file_name TEXT,
+                    file_size INTEGER,
+                    mime_type TEXT,
+                    unique_id TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (client, chat_id, msg_id)
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _select(self, client: str, chat_id: int, msg_id: int):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT file_id, file_name, file_size, mime_type, unique_id FROM file_ids "
+                "WHERE client = ? AND chat_id = ? AND msg_id = ?",
+                (client, chat_id, msg_id),
+            ).fetchone()
+
+    def _upsert(self, row: tuple) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            conn.commit()
+
+    def _delete(self, client: str, chat_id: int, msg_id: int) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM file_ids WHERE client = ? AND chat_id = ? AND msg_id = ?",
+                (client, chat_id, msg_id),
+            )
+            conn.commit()
+
+    async def get(self, client: str, chat_id: int, msg_id: int) -> Optional[FileId]:
+        if not self.enabled:
+            return None
+        try:
+            row = await asyncio.to_thread(self._select, client, chat_id, msg_id)
+        except Exception as e:
+            self.errors += 1
+            LOGGER.debug(f"FileId store read failed for {chat_id}/{msg_id}: {e}")
+            return None
+
+        if not row:
+            self.misses += 1
+            return None
+
+        encoded, file_name, file_size, mime_type, unique_id = row
+        try:
+            file_id = FileId.decode(encoded)
+        except Exception:
+            self.errors += 1
+            return None
+
+        setattr(file_id, 'file_name', file_name or '')
+        setattr(file_id, 'file_size', file_size or 0)
+        setattr(file_id, 'mime_type', mime_type or '')
+        setattr(file_id, 'unique_id', unique_id)
+        self.hits += 1
+        return file_id
+
+    async def put(self, client: str, chat_id: int, msg_id: int, file_id: FileId) -> None:
+        if not self.enabled:
+            return
+        try:
+            row = (
+                client, chat_id, msg_id, file_id.encode(),
+                getattr(file_id, 'file_name', ''), getattr(file_id, 'file_size', 0),
+                getattr(file_id, 'mime_type', ''), getattr(file_id, 'unique_id', None),
+                time.time(),
+            )
+            await asyncio.to_thread(self._upsert, row)
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            LOGGER.debug(f"FileId store write failed for {chat_id}/{msg_id}: {e}")
+
+    async def delete(self, client: str, chat_id: int, msg_id: int) -> None:
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._delete, client, chat_id, msg_id)
+        except Exception as e:
+            self.errors += 1
+            LOGGER.debug(f"FileId store delete failed for {chat_id}/{msg_id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+file_id_store = FileIdStore(Telegram.FILE_ID_STORE)
@@ -0,0 +1,116 @@
+import time
+from collections import deque
+
+from Backend.config import Telegram
+
+# GetFile requests in flight across every stream in the process
+GLOBAL_INFLIGHT = {"count": 0}
+
+
+# AIMD window for the number of concurrent GetFile requests of one stream
+class ParallelismController:
+    LATENCY_ALPHA = 0.2
+    # a chunk is congested when it takes this much longer than the best one seen
+    CONGESTION_FACTOR = 2.0
+    CONGESTION_SLACK = 0.05
+    DECREASE_FACTOR = 0.5
+
+    def __init__(self, initial: int, min_window: int = 1, max_window: int = None, adaptive: bool = True):
+        max_window = max_window or Telegram.MAX_PARALLEL
+        self.min_window = max(1, min_window)
+        self.max_window = max(self.min_window, max_window)
+        self.adaptive = adaptive
+        self.window = float(min(max(initial, self.min_window), self.max_window))
+        self.inflight = 0
+        self._base_latency = None
+        self._latency_ewma = None
+        self._last_mbps = 0.0
+        self._last_decrease = 0.0
+        self.state = {
+            "adaptive": adaptive,
+            "window": int(self.window),
+            "min_window": self.min_window,
+            "max_window": self.max_window,
+            "inflight": 0,
+            "latency_ms": None,
+            "base_latency_ms": None,
+            "increases": 0,
+            "decreases": 0,
+            "decisions": deque(maxlen=20),
+        }
+
+    @property
+    def limit(self) -> int:
+        return int(self.window)
+
+    def can_schedule(self) -> bool:
+        if self.inflight >= self.limit:
+            return False
+        # every stream keeps one request going even when the process-wide cap is reached
+        return self.inflight == 0 or GLOBAL_INFLIGHT["count"] < Telegram.GLOBAL_MAX_INFLIGHT
+
+    def started(self) -> None:
+        self.inflight += 1
+        GLOBAL_INFLIGHT["count"] += 1
+        self.state["inflight"] = self.inflight
+
+    def finished(self) -> None:
+        self.inflight -= 1
+        GLOBAL_INFLIGHT["count"] -= 1
+        self.state["inflight"] = self.inflight
+
+    def on_chunk(self, latency: float, instant_mbps: float) -> None:
+        if self._base_latency is None:
+            self._base_latency = latency
+        else:
+            # let the floor creep up so a DC that got slower for good is not treated as congested forever
+            self._base_latency = min(latency, self._base_latency * 1.01)
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma += self.LATENCY_ALPHA * (latency - self._latency_ewma)
+
+        self.state["latency_ms"] = round(self._latency_ewma * 1000, 1)
+        self.state["base_latency_ms"] = round(self._base_latency * 1000, 1)
+
+        if not self.adaptive:
+            return
+
+        threshold = self._base_latency * self.CONGESTION_FACTOR + self.CONGESTION_SLACK
+        if latency > threshold:
+            self._decrease("latency", latency, instant_mbps)
+        elif instant_mbps >= self._last_mbps * 0.9:
+            # +1 per window's worth of chunks, like TCP congestion avoidance
+            self._set_window(self.window + 1.0 / self.window, "throughput", latency, instant_mbps)
+
+        self._last_mbps = instant_mbps
+
+    def on_error(self) -> None:
+        if self.adaptive:
+            self._decrease("error", None, None)
+
+    def _decrease(self, reason: str, latency, instant_mbps) -> None:
+        now = time.time()
+        # at most one back-off per round trip so a burst of slow chunks counts once
+        if now - self._last_decrease < (self._latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self._set_window(self.window * self.DECREASE_FACTOR, reason, latency, instant_mbps)
+
+    def _set_window(self, window: float, reason: str, latency, instant_mbps) -> None:
+        old = int(self.window)
+        self.window = min(max(window, float(self.min_window)), float(self.max_window))
+        new = int(self.window)
+        if new == old:
+            return
+
+        self.state["window"] = new
+        self.state["increases" if new > old else "decreases"] += 1
+        self.state["decisions"].append({
+            "ts": time.time(),
+            "from": old,
+            "to": new,
+            "reason": reason,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "instant_mbps": round(instant_mbps, 3) if instant_mbps is not None else None,
+        })
@@ -0,0 +1,76 @@
+from typing import NamedTuple, Optional
+
+# upload.getFile rules: offset and limit are multiples of 4 KB, limit divides 1 MB
+# and a single request never crosses a 1 MB boundary
+MIN_LIMIT = 4 * 1024
+MAX_LIMIT = 1024 * 1024
+
+
+class FilePart(NamedTuple):
+    offset: int
+    limit: int
+    # slice of the response that belongs to the requested range
+    cut_start: int
+    cut_end: int
+
+
+def edge_part(start: int, end: int) -> FilePart:
+    # smallest valid request covering start..end, which must lie inside one 1 MB block
+    base = start - start % MAX_LIMIT
+    aligned = start - start % MIN_LIMIT
+    limit = MIN_LIMIT
+    while limit < MAX_LIMIT and aligned + limit <= end:
+        limit *= 2
+    offset = min(aligned, base + MAX_LIMIT - limit)
+    return FilePart(offset, limit, start - offset, end - offset + 1)
+
+
+class RangePlan:
+    # the GetFile requests for bytes start..end, built on demand so a full-file range stays small
+    def __init__(self, start: int, end: int, lead_bytes: int = 0):
+        self.start = start
+        self.end = end
+        self.first_block = start // MAX_LIMIT
+        self.last_block = end // MAX_LIMIT
+        self.blocks = max(0, self.last_block - self.first_block + 1) if end >= start else 0
+        self.lead: Optional[FilePart] = None
+        self._lead_end = None
+
+        if lead_bytes and self.blocks:
+            # a small first request gets the first byte out before the whole first block arrives
+            first = self._block_part(0)
+            if first.limit > 2 * lead_bytes:
+                lead = edge_part(start, min(start + lead_bytes, first.offset + first.cut_end) - 1)
+                lead_end = min(lead.offset + lead.limit, first.offset + first.cut_end) - 1
+                if lead_end < first.offset + first.cut_end - 1:
+                    self.lead = lead._replace(cut_end=lead_end - lead.offset + 1)
+                    self._lead_end = lead_end
+
+    def _block_part(self, index: int) -> FilePart:
+        block = self.first_block + index
+        if self.first_block < block < self.last_block:
+            return FilePart(block * MAX_LIMIT, MAX_LIMIT, 0, MAX_LIMIT)
+        lo = self.start if block == self.first_block else block * MAX_LIMIT
+        hi = self.end if block == self.last_block else block * MAX_LIMIT + MAX_LIMIT - 1
+        return edge_part(lo, hi)
+
+    def drop_lead(self) -> None:
+        self.lead = None
+        self._lead_end = None
+
+    def __len__(self) -> int:
+        return self.blocks + (1 if self.lead else 0)
+
+    def __getitem__(self, index: int) -> FilePart:
+        if self.lead:
+            if index == 0:
+                return self.lead
+            index -= 1
+        if not 0 <= index < self.blocks:
+            raise IndexError(index)
+        part = self._block_part(index)
+        if index == 0 and self.lead:
+            # the lead request already delivered the start of this block
+            part = part._replace(cut_start=self._lead_end + 1 - part.offset)
+        return part
+
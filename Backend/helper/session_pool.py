@@ -0,0 +1,155 @@
+import asyncio
+import secrets
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from pyrogram import raw
+from pyrogram.session import Session
+
+from Backend.logger import LOGGER
+
+
+class PooledSession:
+    def __init__(self, session: Session, primary: bool = False):
+        self.session = session
+        self.primary = primary
+        self.id = secrets.token_hex(3)
+        self.busy = 0
+        self.errors = 0
+        self.requests = 0
+        self.created = time.time()
+        self.last_used = self.created
+
+    @property
+    def healthy(self) -> bool:
+        return self.errors < MediaSessionPool.MAX_ERRORS and self.session.is_started.is_set()
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "primary": self.primary,
+            "busy": self.busy,
+            "errors": self.errors,
+            "requests": self.requests,
+            "healthy": self.healthy,
+            "idle_seconds": round(time.time() - self.last_used, 1) if not self.busy else 0,
+        }
+
+
+class MediaSessionPool:
+    # grow once the least busy member already carries this many requests
+    GROW_THRESHOLD = 4
+    IDLE_TIMEOUT = 300
+    MAX_ERRORS = 3
+    PING_TIMEOUT = 10
+
+    def __init__(self, dc_id: int, factory: Callable[[int], Awaitable[Session]], max_size: int):
+        self.dc_id = dc_id
+        self.max_size = max(1, max_size)
+        self._factory = factory
+        self.members: List[PooledSession] = []
+        self._growing = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def primary(self) -> Optional[Session]:
+        return self.members[0].session if self.members else None
+
+    def add(self, session: Session, primary: bool = False) -> PooledSession:
+        member = PooledSession(session, primary=primary)
+        self.members.append(member)
+        return member
+
+    def acquire(self) -> PooledSession:
+        healthy = [m for m in self.members if m.healthy] or self.members
+        member = min(healthy, key=lambda m: m.busy)
+
+        if member.busy >= self.GROW_THRESHOLD and len(self.members) < self.max_size and not self._growing:
+            self._growing = True
+            asyncio.create_task(self._grow())
+
+        return self._take(member)
+
+    async def acquire_other(self, exclude: List[PooledSession]) -> Optional[PooledSession]:
+        # a healthy member the caller has not given up on, opening one if the pool has room
+        others = [m for m in self.members if m.healthy and m not in exclude]
+        if not others and len(self.members) < self.max_size and not self._growing:
+            self._growing = True
+            await self._grow()
+            others = [m for m in self.members if m.healthy and m not in exclude]
+        if not others:
+            return None
+        return self._take(min(others, key=lambda m: m.busy))
+
+    def _take(self, member: PooledSession) -> PooledSession:
+        member.busy += 1
+        member.requests += 1
+        member.last_used = time.time()
+        return member
+
+    def release(self, member: PooledSession, ok: bool = True) -> None:
+        member.busy = max(0, member.busy - 1)
+        member.last_used = time.time()
+        if ok:
+            member.errors = 0
+        else:
+            member.errors += 1
+
+    async def _grow(self) -> None:
+        try:
+            session = await self._factory(self.dc_id)
+            self.add(session)
+            LOGGER.debug(f"Media session pool DC {self.dc_id} grew to {len(self.members)}")
+        except Exception as e:
+            LOGGER.debug(f"Could not grow media session pool for DC {self.dc_id}: {e}")
+        finally:
+            self._growing = False
+
+    async def _ping(self, member: PooledSession) -> bool:
+        try:
+            await member.session.send(
+                raw.functions.Ping(ping_id=secrets.randbits(63)), timeout=self.PING_TIMEOUT
+            )
+            return True
+        except Exception:
+            return False
+
+    async def maintain(self) -> None:
+        async with self._lock:
+            now = time.time()
+            for member in list(self.members):
+                if member.busy:
+                    continue
+
+                if member.primary:
+                    # pyrogram also uses the primary session, it is only checked, never dropped
+                    if await self._ping(member):
+                        member.errors = 0
+                    else:
+                        member.errors += 1
+                    continue
+
+                idle = now - member.last_used > self.IDLE_TIMEOUT
+                if member.healthy and not idle and await self._ping(member):
+                    continue
+                if member.busy:
+                    # picked up by a stream while the ping was in flight
+                    continue
+
+                self.members.remove(member)
+                LOGGER.debug(
+                    f"Dropping {'idle' if idle else 'unhealthy'} media session {member.id} for DC {self.dc_id}"
+                )
+                try:
+                    await member.session.stop()
+                except Exception:
+                    pass
+
+    def info(self) -> dict:
+        return {
+            "dc_id": self.dc_id,
+            "size": len(self.members),
+            "max_size": self.max_size,
+            "members": [m.info() for m in self.members],
+        }
+
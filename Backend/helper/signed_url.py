@@ -0,0 +1,52 @@
+import hashlib
+import hmac
+from typing import Mapping, Optional
+from urllib.parse import urlencode
+
+from pyrogram.file_id import FileId
+
+from Backend.config import Telegram
+
+_KEY = hashlib.sha256(f"stream-url:{Telegram.URL_SECRET}".encode()).digest()
+
+
+def _signature(token: str, encoded_id: str, unique: str, size: int, dc_id: int, file_name: str, mime_type: str) -> str:
+    message = "|".join((token, encoded_id, unique, str(size), str(dc_id), file_name, mime_type)).encode()
+    return hmac.new(_KEY, message, hashlib.sha256).hexdigest()[:24]
+
+
+def sign_stream_query(token: str, encoded_id: str, file_id: FileId, file_name: str, mime_type: str) -> str:
+    # the name and type are the ones GET will send, so HEAD can answer with the same headers
+    unique = file_id.unique_id[:6]
+    size = int(file_id.file_size or 0)
+    return urlencode({
+        "h": unique,
+        "s": size,
+        "dc": file_id.dc_id,
+        "n": file_name,
+        "mt": mime_type,
+        "sig": _signature(token, encoded_id, unique, size, file_id.dc_id, file_name, mime_type),
+    })
+
+
+def verify_stream_query(token: str, encoded_id: str, params: Mapping[str, str]) -> Optional[dict]:
+    try:
+        unique = params["h"]
+        size = int(params["s"])
+        dc_id = int(params["dc"])
+        file_name = params["n"]
+        mime_type = params["mt"]
+        signature = params["sig"]
+    except (KeyError, ValueError):
+        return None
+
+    if not hmac.compare_digest(signature, _signature(token, encoded_id, unique, size, dc_id, file_name, mime_type)):
+        return None
+
+    return {
+        "unique_prefix": unique,
+        "file_size": size,
+        "dc_id": dc_id,
+        "file_name": file_name,
+        "mime_type": mime_type,
+    }
@@ -0,0 +1,131 @@
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional
+
+from Backend.config import Telegram
+
+
+class ChunkEvent:
+    __slots__ = (
+        "seq", "offset", "limit", "scheduled", "sent", "received", "enqueued", "yielded",
+        "retries", "client_index", "session", "cached", "failed",
+    )
+
+    def __init__(self, seq: int, offset: int, limit: int, scheduled: float):
+        self.seq = seq
+        self.offset = offset
+        self.limit = limit
+        self.scheduled = scheduled
+        self.sent = None
+        self.received = None
+        self.enqueued = None
+        self.yielded = None
+        self.retries = 0
+        self.client_index = None
+        self.session = None
+        self.cached = False
+        self.failed = False
+
+
+class StreamTimeline:
+    # the last MAX_EVENTS chunks of one stream, times are kept as time.time() and shown relative to start
+    MAX_EVENTS = 512
+
+    def __init__(self, stream_id: str, start_ts: float):
+        self.stream_id = stream_id
+        self.start_ts = start_ts
+        self.events: Deque[ChunkEvent] = deque(maxlen=self.MAX_EVENTS)
+        self._by_seq = {}
+        # enqueued but not yet yielded, in queue order
+        self._queued: Deque[ChunkEvent] = deque()
+        self._unyielded: List[ChunkEvent] = []
+
+    def scheduled(self, seq: int, offset: int, limit: int) -> None:
+        event = ChunkEvent(seq, offset, limit, time.time())
+        self.events.append(event)
+        self._by_seq[seq] = event
+
+    def event(self, seq: int) -> Optional[ChunkEvent]:
+        return self._by_seq.get(seq)
+
+    def enqueued(self, seq: int) -> None:
+        event = self._by_seq.pop(seq, None)
+        if event is not None:
+            event.enqueued = time.time()
+            self._queued.append(event)
+
+    def dequeued(self) -> None:
+        if self._queued:
+            self._unyielded.append(self._queued.popleft())
+
+    def yielded(self) -> None:
+        # small pieces are merged before they are sent, so one yield can finish several chunks
+        now = time.time()
+        for event in self._unyielded:
+            event.yielded = now
+        self._unyielded.clear()
+
+    def _ms(self, ts: Optional[float]) -> Optional[float]:
+        return round((ts - self.start_ts) * 1000, 1) if ts is not None else None
+
+    def snapshot(self) -> dict:
+        return {
+            "stream_id": self.stream_id,
+            "start_ts": self.start_ts,
+            "events": [
+                {
+                    "seq": e.seq,
+                    "offset": e.offset,
+                    "limit": e.limit,
+                    "scheduled_ms": self._ms(e.scheduled),
+                    "sent_ms": self._ms(e.sent),
+                    "received_ms": self._ms(e.received),
+                    "enqueued_ms": self._ms(e.enqueued),
+                    "yielded_ms": self._ms(e.yielded),
+                    "retries": e.retries,
+                    "client_index": e.client_index,
+                    "session": e.session,
+                    "cached": e.cached,
+                    "failed": e.failed,
+                }
+                for e in self.events
+            ],
+        }
+
+
+class TimelineStore:
+    MAX_STREAMS = 64
+
+    def __init__(self, sample_rate: float):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self._timelines: "OrderedDict[str, StreamTimeline]" = OrderedDict()
+
+    def _sampled(self, stream_id: str) -> bool:
+        # decided on the response id, so every part of a multi-range response is kept or none is
+        parent = stream_id.split("-", 1)[0]
+        return zlib.crc32(parent.encode()) / 2 ** 32 < self.sample_rate
+
+    def start(self, stream_id: str, start_ts: float, forced: bool = False) -> Optional[StreamTimeline]:
+        if not forced and not self._sampled(stream_id):
+            return None
+        timeline = StreamTimeline(stream_id, start_ts)
+        self._timelines[stream_id] = timeline
+        while len(self._timelines) > self.MAX_STREAMS:
+            self._timelines.popitem(last=False)
+        return timeline
+
+    def get(self, stream_id: str) -> Optional[StreamTimeline]:
+        return self._timelines.get(stream_id)
+
+    def parts(self, stream_id: str) -> List[StreamTimeline]:
+        # a multi-range response records one timeline per part, as {stream_id}-{n}
+        parts = []
+        while True:
+            timeline = self._timelines.get(f"{stream_id}-{len(parts)}")
+            if timeline is None:
+                return parts
+            parts.append(timeline)
+
+
+stream_timelines = TimelineStore(Telegram.STREAM_TIMELINE_SAMPLE)
@@ -1,6 +1,7 @@
 from asyncio import sleep
 from pyrogram.errors import FloodWait
 from Backend.logger import LOGGER
+from Backend.helper.client_health import client_health
 from Backend.pyrofork.bot import Helper
 
 async def edit_message(chat_id: int, msg_id: int, new_caption: str):
@@ -13,6 +14,7 @@ async def edit_message(chat_id: int, msg_id: int, new_caption: str):
         await sleep(2)
     except FloodWait as e:
         LOGGER.warning(f"FloodWait for {e.value} seconds while editing message {msg_id} in {chat_id}")
+        client_health.record_flood_wait(client_health.key_for(Helper), e.value, "edit")
         await sleep(e.value)
     except Exception as e:
         LOGGER.error(f"Error while editing message {msg_id} in {chat_id}: {e}")
@@ -27,6 +29,7 @@ async def delete_message(chat_id: int, msg_id: int):
         LOGGER.info(f"Deleted message {msg_id} in {chat_id}")
     except FloodWait as e:
         LOGGER.warning(f"FloodWait for {e.value} seconds while deleting message {msg_id} in {chat_id}")
+        client_health.record_flood_wait(client_health.key_for(Helper), e.value, "delete")
         await sleep(e.value)
     except Exception as e:
         LOGGER.error(f"Error while deleting message {msg_id} in {chat_id}: {e}")
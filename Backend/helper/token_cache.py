@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class TokenCache:
+    TTL = 30
+    # unknown tokens are remembered briefly so guessing does not reach the database
+    NEGATIVE_TTL = 5
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        # token -> (document or None, loaded at, flushed usage bytes at load)
+        self._entries: "OrderedDict[str, Tuple[Optional[dict], float, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Tuple[Optional[dict], int]]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        doc, loaded_at, usage_base = entry
+        if time.monotonic() - loaded_at >= (self.TTL if doc else self.NEGATIVE_TTL):
+            self._entries.pop(token, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(token)
+        return doc, usage_base
+
+    def put(self, token: str, doc: Optional[dict], usage_base: int) -> Tuple[Optional[dict], int]:
+        self._entries[token] = (doc, time.monotonic(), usage_base)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        return doc, usage_base
+
+    def invalidate(self, token: str) -> None:
+        if self._entries.pop(token, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+token_cache = TokenCache()
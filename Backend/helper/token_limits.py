@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from Backend.helper.exceptions import StreamLimitExceeded
+
+
+class TokenBucket:
+    # shared by every stream of one token, so the cap applies to their sum
+    BURST_SECONDS = 2.0
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate * self.BURST_SECONDS
+        self.last = time.monotonic()
+        self.throttled = 0.0
+
+    def set_rate(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = min(self.tokens, rate * self.BURST_SECONDS)
+
+    async def consume(self, nbytes: int) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.rate * self.BURST_SECONDS, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        # callers go into debt and sleep it off, concurrent streams queue up behind each other
+        self.tokens -= nbytes
+        if self.tokens < 0:
+            delay = -self.tokens / self.rate
+            self.throttled += delay
+            await asyncio.sleep(delay)
+
+
+class TokenLimiter:
+    def __init__(self):
+        self.streams: Dict[str, int] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        # shown in the stats instead of the token, which is a credential
+        self.names: Dict[str, str] = {}
+        self.rejected = 0
+
+    def open(self, token: str, limits: Optional[dict], name: Optional[str] = None) -> Optional[TokenBucket]:
+        limits = limits or {}
+        max_streams = int(limits.get("max_streams") or 0)
+        max_mbps = float(limits.get("max_mbps") or 0)
+
+        active = self.streams.get(token, 0)
+        if max_streams > 0 and active >= max_streams:
+            self.rejected += 1
+            raise StreamLimitExceeded
+        self.streams[token] = active + 1
+        self.names[token] = name or "unnamed"
+
+        if max_mbps <= 0:
+            self.buckets.pop(token, None)
+            return None
+        rate = max_mbps * 1_000_000 / 8
+        bucket = self.buckets.get(token)
+        if bucket is None:
+            bucket = self.buckets[token] = TokenBucket(rate)
+        elif bucket.rate != rate:
+            bucket.set_rate(rate)
+        return bucket
+
+    def close(self, token: str) -> None:
+        active = self.streams.get(token, 0) - 1
+        if active > 0:
+            self.streams[token] = active
+        else:
+            self.streams.pop(token, None)
+            self.buckets.pop(token, None)
+            self.names.pop(token, None)
+
+    def stats(self) -> dict:
+        return {
+            "rejected": self.rejected,
+            "tokens": [
+                {
+                    "name": self.names.get(token, "unnamed"),
+                    "streams": count,
+                    "max_mbps": round(self.buckets[token].rate * 8 / 1_000_000, 2) if token in self.buckets else None,
+                    "throttled_seconds": round(self.buckets[token].throttled, 1) if token in self.buckets else 0.0,
+                }
+                for token, count in self.streams.items()
+            ],
+        }
+
+
+token_limiter = TokenLimiter()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Dict
+
+from Backend import db
+from Backend.logger import LOGGER
+
+
+class UsageAggregator:
+    # per-token byte counts collected from every stream and written in one bulk_write
+    FLUSH_INTERVAL = 5
+
+    def __init__(self):
+        self.pending: Dict[str, int] = {}
+        # running totals since start, so cached token documents can add what they have not seen yet
+        self.added: Dict[str, int] = {}
+        self.flushed: Dict[str, int] = {}
+        self._task = None
+        self._flushing = asyncio.Lock()
+        self.flushes = 0
+        self.errors = 0
+        self.last_flush = None
+
+    def add(self, token: str, nbytes: int) -> None:
+        if token and nbytes > 0:
+            self.pending[token] = self.pending.get(token, 0) + nbytes
+            self.added[token] = self.added.get(token, 0) + nbytes
+
+    def added_bytes(self, token: str) -> int:
+        return self.added.get(token, 0)
+
+    def flushed_bytes(self, token: str) -> int:
+        return self.flushed.get(token, 0)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flushing:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            try:
+                await db.bulk_update_token_usage(batch)
+                for token, nbytes in batch.items():
+                    self.flushed[token] = self.flushed.get(token, 0) + nbytes
+                self.flushes += 1
+                self.last_flush = time.time()
+            except Exception as e:
+                self.errors += 1
+                # keep the bytes for the next round instead of dropping them
+                for token, nbytes in batch.items():
+                    self.pending[token] = self.pending.get(token, 0) + nbytes
+                LOGGER.error(f"Usage flush failed for {len(batch)} tokens: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_tokens": len(self.pending),
+            "pending_bytes": sum(self.pending.values()),
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "last_flush": self.last_flush,
+        }
+
+
+usage_aggregator = UsageAggregator()
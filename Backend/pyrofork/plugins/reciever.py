@@ -6,6 +6,7 @@ from Backend import db
 from Backend.config import Telegram
 from Backend.helper.pyro import clean_filename, get_readable_file_size, remove_urls
 from Backend.helper.metadata import metadata
+from Backend.helper.client_health import client_health
 from pyrogram import filters, Client
 from pyrogram.types import Message
 from pyrogram.errors import FloodWait
@@ -63,6 +64,7 @@ async def file_receive_handler(client: Client, message: Message):
                 await message.reply_text("> Not supported")
         except FloodWait as e:
             LOGGER.info(f"Sleeping for {str(e.value)}s")
+            client_health.record_flood_wait(client_health.key_for(client), e.value, "ingest")
             await asleep(e.value)
             await message.reply_text(
                 text=f"Got Floodwait of {str(e.value)}s",
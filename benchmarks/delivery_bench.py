@@ -0,0 +1,151 @@
+# CPU cost of the ByteStreamer delivery path (queue -> consumer -> body chunks).
+#
+# Chunks are served from a pre-filled in-memory chunk cache, so no Telegram or network
+# work is measured, only what prefetch_stream does per byte it hands to the response.
+# Compare against an older commit, checked out into a temporary git worktree:
+#
+#     python benchmarks/delivery_bench.py --gb 4 --range-mb 64 --baseline HEAD~1
+#
+# Only what every revision since the chunk cache has is used, so the same file runs on the
+# commit before the memoryview delivery path as well (BENCH_TREE points it at another tree).
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.environ.get("BENCH_TREE") or REPO)
+os.environ.setdefault("DATABASE", "mongodb://bench,mongodb://bench")
+os.environ.setdefault("CHUNK_CACHE_MB", "4096")
+
+from Backend.helper import custom_dl  # noqa: E402
+from Backend.helper.chunk_cache import chunk_cache  # noqa: E402
+from Backend.pyrofork.bot import work_loads  # noqa: E402
+
+try:
+    from Backend.helper.range_planner import RangePlan
+except ImportError:  # before GetFile requests were planned per range
+    RangePlan = None
+try:
+    from Backend.helper.session_pool import MediaSessionPool
+except ImportError:  # before media sessions were pooled
+    MediaSessionPool = None
+
+CHUNK = custom_dl.ByteStreamer.CHUNK_SIZE
+MEDIA_ID = 7
+
+
+class IdleSession:
+    dc_id = 4
+
+    def __init__(self):
+        self.is_started = asyncio.Event()
+        self.is_started.set()
+
+    async def send(self, *args, **kwargs):
+        raise RuntimeError("benchmark chunks must come from the cache")
+
+
+def make_streamer():
+    streamer = custom_dl.ByteStreamer.__new__(custom_dl.ByteStreamer)
+    streamer.client = SimpleNamespace(media_sessions={4: IdleSession()}, name="bench")
+
+    async def get_location(file_id):
+        return None
+
+    streamer._get_location = get_location
+    if MediaSessionPool is not None:
+        pool = MediaSessionPool(4, None, 1)
+        pool.add(IdleSession(), primary=True)
+        streamer._session_pools = {4: pool}
+
+        async def get_pool(dc):
+            return pool
+
+        streamer._get_session_pool = get_pool
+    else:
+        async def get_media_session(file_id):
+            return streamer.client.media_sessions[4]
+
+        streamer._get_media_session = get_media_session
+    return streamer
+
+
+def range_args(streamer, start: int, end: int) -> dict:
+    if RangePlan is not None:
+        return {"parts": RangePlan(start, end, lead_bytes=streamer.LEAD_BYTES)}
+    offset = start - start % CHUNK
+    return {
+        "offset": offset,
+        "first_part_cut": start - offset,
+        "last_part_cut": end % CHUNK + 1,
+        "part_count": end // CHUNK - offset // CHUNK + 1,
+        "chunk_size": CHUNK,
+    }
+
+
+async def deliver(streamer, file_id, start, end):
+    body = await streamer.prefetch_stream(
+        file_id=file_id,
+        client_index=0,
+        prefetch=4,
+        parallelism=4,
+        **range_args(streamer, start, end),
+    )
+    delivered = 0
+    async for piece in body:
+        delivered += len(piece)
+    return delivered
+
+
+async def main(args):
+    work_loads[0] = 0
+    range_bytes = args.range_mb * CHUNK
+    size = range_bytes + 2 * CHUNK
+    payload = os.urandom(CHUNK)
+    for off in range(0, size, CHUNK):
+        chunk_cache.put((MEDIA_ID, off), payload)
+
+    file_id = SimpleNamespace(media_id=MEDIA_ID, dc_id=4, file_size=size, message_ref=(0, 0))
+    streamer = make_streamer()
+
+    target = int(args.gb * 1024 ** 3)
+    delivered = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while delivered < target:
+        # unaligned on both ends so every range has two edge cuts
+        delivered += await deliver(streamer, file_id, 12345, 12345 + range_bytes - 1)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    gb = delivered / 1024 ** 3
+    print(f"delivered     {gb:.2f} GB in {wall:.2f}s ({delivered / 1024 ** 2 / wall:.0f} MB/s)")
+    print(f"cpu per GB    {cpu / gb:.3f} s")
+
+
+def run_baseline(revision: str, argv: list) -> None:
+    with tempfile.TemporaryDirectory() as tree:
+        subprocess.run(["git", "-C", REPO, "worktree", "add", "--detach", "-q", tree, revision], check=True)
+        try:
+            print(f"--- {revision}")
+            env = {**os.environ, "BENCH_TREE": tree}
+            subprocess.run([sys.executable, os.path.abspath(__file__), *argv], env=env, cwd=tree, check=True)
+        finally:
+            subprocess.run(["git", "-C", REPO, "worktree", "remove", "--force", tree], check=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gb", type=float, default=2.0, help="total data to deliver")
+    parser.add_argument("--range-mb", type=int, default=64, help="size of each requested range")
+    parser.add_argument("--baseline", help="git revision to run first, for a before/after comparison")
+    args = parser.parse_args()
+    if args.baseline:
+        run_baseline(args.baseline, ["--gb", str(args.gb), "--range-mb", str(args.range_mb)])
+        print("--- working tree")
+    asyncio.run(main(args))
@@ -0,0 +1,302 @@
+# End-to-end streaming benchmark against an in-process fake Telegram media DC.
+#
+# upload.GetFile is answered by FakeDC with configurable latency, jitter, bandwidth, errors and
+# FloodWaits, and every range request goes through the real ASGI app: signed /dl route,
+# admission, range planner, prefetch_stream and delivery. The swept settings are comma
+# separated and every combination is one run, so two commits can be compared line by line:
+#
+#     python benchmarks/streaming_bench.py --streams 32 --parallel 1,4,8 --prefetch 1,4
+#     python benchmarks/streaming_bench.py --latency-ms 120 --jitter-ms 60 --error-rate 0.02 --flood-rate 0.005
+#
+# GetFile requests are at most 1 MB (a Telegram limit the range planner is built on), so the
+# request size axis sweeps the lead request (--lead-kb) and the size of each range (--range-mb).
+# The chunk cache is off unless CHUNK_CACHE_MB is set, so every byte comes from the fake DC.
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import resource
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE", "mongodb://bench,mongodb://bench")
+os.environ.setdefault("CHUNK_CACHE_MB", "0")
+os.environ.setdefault("DISK_CACHE_GB", "0")
+os.environ.setdefault("FILE_ID_STORE", "")
+os.environ.setdefault("INDEX_PREFETCH", "false")
+
+from pyrogram.errors import FloodWait  # noqa: E402
+
+from Backend.config import Telegram  # noqa: E402
+from Backend.fastapi.main import app  # noqa: E402
+from Backend.fastapi.routes import stream_routes  # noqa: E402
+from Backend.fastapi.security.tokens import verify_token  # noqa: E402
+from Backend.helper.admission import admission  # noqa: E402
+from Backend.helper.client_health import client_health  # noqa: E402
+from Backend.helper.custom_dl import ByteStreamer  # noqa: E402
+from Backend.helper.encrypt import encode_string  # noqa: E402
+from Backend.helper.session_pool import MediaSessionPool  # noqa: E402
+from Backend.helper.signed_url import sign_stream_query  # noqa: E402
+from Backend.pyrofork.bot import client_dc_map, multi_clients, work_loads  # noqa: E402
+
+CHUNK = ByteStreamer.CHUNK_SIZE
+DC_ID = 4
+TOKEN = "bench"
+
+
+class FakeDC:
+    def __init__(self, args):
+        self.latency = args.latency_ms / 1000
+        self.jitter = args.jitter_ms / 1000
+        self.session_rate = args.session_mbps * 1024 * 1024
+        self.error_rate = args.error_rate
+        self.flood_rate = args.flood_rate
+        self.flood_seconds = args.flood_seconds
+        self.rng = random.Random(args.seed)
+        self.block = os.urandom(CHUNK)
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.errors = 0
+        self.flood_waits = 0
+        self.bytes = 0
+
+    async def get_file(self, query):
+        self.requests += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if self.session_rate:
+            delay += query.limit / self.session_rate
+        await asyncio.sleep(max(0.0, delay))
+
+        roll = self.rng.random()
+        if roll < self.flood_rate:
+            self.flood_waits += 1
+            raise FloodWait(value=self.flood_seconds)
+        if roll < self.flood_rate + self.error_rate:
+            self.errors += 1
+            raise TimeoutError("injected GetFile error")
+
+        start = query.offset % CHUNK
+        chunk = self.block[start:start + query.limit]
+        self.bytes += len(chunk)
+        return SimpleNamespace(bytes=chunk)
+
+
+class FakeClient:
+    def __init__(self, name: str):
+        self.name = name
+        self.media_sessions = {}
+
+
+class FakeSession:
+    dc_id = DC_ID
+
+    def __init__(self, dc: FakeDC):
+        self.dc = dc
+        self.is_started = asyncio.Event()
+        self.is_started.set()
+
+    async def send(self, query, *args, **kwargs):
+        return await self.dc.get_file(query)
+
+    async def stop(self):
+        self.is_started.clear()
+
+
+def fake_file_id(msg_id: int, size: int):
+    return SimpleNamespace(
+        media_id=msg_id, dc_id=DC_ID, file_size=size, unique_id=f"bench{msg_id:04d}",
+        file_name=f"bench{msg_id}.mkv", mime_type="video/x-matroska", message_ref=(None, msg_id),
+    )
+
+
+def make_streamer(client, dc: FakeDC, file_size: int) -> ByteStreamer:
+    streamer = ByteStreamer.__new__(ByteStreamer)
+    streamer.client = client
+    streamer._session_lock = asyncio.Lock()
+    streamer._session_pools = {}
+
+    async def factory(dc_id):
+        return FakeSession(dc)
+
+    async def get_pool(dc_id):
+        pool = streamer._session_pools.get(dc_id)
+        if pool is None:
+            pool = streamer._session_pools[dc_id] = MediaSessionPool(dc_id, factory, Telegram.MEDIA_SESSIONS_PER_DC)
+            pool.add(FakeSession(dc), primary=True)
+        return pool
+
+    async def get_location(file_id):
+        return None
+
+    async def get_file_properties(chat_id, message_id):
+        return fake_file_id(message_id, file_size)
+
+    streamer._get_session_pool = get_pool
+    streamer._get_location = get_location
+    streamer.get_file_properties = get_file_properties
+    return streamer
+
+
+async def stream_url(msg_id: int, file_size: int) -> tuple:
+    encoded = await encode_string({"chat_id": 1, "msg_id": msg_id})
+    file_id = fake_file_id(msg_id, file_size)
+    query = sign_stream_query(TOKEN, encoded, file_id, *stream_routes.file_display(file_id))
+    return f"/dl/{TOKEN}/{encoded}/bench{msg_id}.mkv", query
+
+
+async def get_range(path: str, query: str, start: int, end: int) -> dict:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"range", f"bytes={start}-{end}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    result = {"status": None, "ttfb": None, "bytes": 0}
+    requested = False
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # the client never goes away, the response ends by itself
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if result["ttfb"] is None:
+                result["ttfb"] = time.perf_counter() - started
+            result["bytes"] += len(message["body"])
+
+    await app(scope, receive, send)
+    return result
+
+
+async def viewer(msg_id: int, args, rng: random.Random, results: list) -> None:
+    file_size = args.file_mb * CHUNK
+    range_bytes = min(args.range_mb * CHUNK, file_size)
+    path, query = await stream_url(msg_id, file_size)
+    for _ in range(args.requests):
+        start = rng.randrange(0, file_size - range_bytes + 1)
+        end = start + range_bytes - 1
+        result = await get_range(path, query, start, end)
+        result["expected"] = end - start + 1
+        results.append(result)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(args, dc: FakeDC, lead_kb: int, range_mb: int, parallel: int, prefetch: int) -> dict:
+    ByteStreamer.LEAD_BYTES = lead_kb * 1024
+    Telegram.PARALLEL = parallel
+    Telegram.PRE_FETCH = prefetch
+    run_args = argparse.Namespace(**{**vars(args), "range_mb": range_mb})
+
+    dc.reset()
+    client_health.__init__()
+    rng = random.Random(args.seed)
+    results = []
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(
+        viewer(msg_id, run_args, random.Random(rng.random()), results)
+        for msg_id in range(1, args.streams + 1)
+    ))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    delivered = sum(r["bytes"] for r in results)
+    ttfbs = [r["ttfb"] for r in results if r["ttfb"] is not None]
+    return {
+        "mb_s": delivered / CHUNK / wall,
+        "ttfb": [percentile(ttfbs, q) * 1000 for q in (0.5, 0.95, 0.99)],
+        "cpu_gb": cpu / (delivered / 1024 ** 3) if delivered else 0.0,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "getfile": dc.requests,
+        "errors": dc.errors,
+        "flood_waits": dc.flood_waits,
+        "failed": sum(1 for r in results if r["status"] != 206 or r["bytes"] != r["expected"]),
+    }
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+async def main(args):
+    # measure delivery, not the stream caps
+    admission.per_client = 0
+    admission.max_streams = 0
+    app.dependency_overrides[verify_token] = lambda: {}
+
+    dc = FakeDC(args)
+    work_loads.clear()
+    multi_clients.clear()
+    for index in range(args.bots):
+        client = FakeClient(f"bench{index}")
+        multi_clients[index] = client
+        work_loads[index] = 0
+        client_dc_map[index] = DC_ID
+        stream_routes._streamer_by_client[client] = make_streamer(client, dc, args.file_mb * CHUNK)
+
+    print(
+        f"{args.streams} viewers x {args.requests} ranges, {args.bots} bot(s), "
+        f"GetFile {args.latency_ms}+-{args.jitter_ms} ms, errors {args.error_rate}, floods {args.flood_rate}"
+    )
+    print(
+        f"{'lead_kb':>7} {'range_mb':>8} {'parallel':>8} {'prefetch':>8} | {'MB/s':>8} "
+        f"{'ttfb p50':>8} {'p95':>7} {'p99':>7} | {'cpu s/GB':>8} {'rss MB':>7} | "
+        f"{'getfile':>7} {'errors':>6} {'floods':>6} {'failed':>6}"
+    )
+    for lead_kb, range_mb, parallel, prefetch in itertools.product(
+        int_list(args.lead_kb), int_list(args.range_mb), int_list(args.parallel), int_list(args.prefetch)
+    ):
+        r = await run(args, dc, lead_kb, range_mb, parallel, prefetch)
+        p50, p95, p99 = r["ttfb"]
+        print(
+            f"{lead_kb:>7} {range_mb:>8} {parallel:>8} {prefetch:>8} | {r['mb_s']:>8.1f} "
+            f"{p50:>8.1f} {p95:>7.1f} {p99:>7.1f} | {r['cpu_gb']:>8.3f} {r['rss_mb']:>7.0f} | "
+            f"{r['getfile']:>7} {r['errors']:>6} {r['flood_waits']:>6} {r['failed']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=16, help="concurrent viewers, each on its own file")
+    parser.add_argument("--requests", type=int, default=4, help="sequential range requests per viewer")
+    parser.add_argument("--bots", type=int, default=1, help="fake bot clients sharing the DC")
+    parser.add_argument("--file-mb", type=int, default=256, help="size of every file")
+    parser.add_argument("--range-mb", default="8", help="size of each range request (sweep)")
+    parser.add_argument("--lead-kb", default="64", help="size of the first GetFile of a range (sweep)")
+    parser.add_argument("--parallel", default="1,4", help="initial parallelism per stream (sweep)")
+    parser.add_argument("--prefetch", default="1,4", help="delivery queue depth per stream (sweep)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="GetFile round trip")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="uniform +- jitter on the round trip")
+    parser.add_argument("--session-mbps", type=float, default=0.0, help="transfer rate per GetFile, 0 for none")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of GetFile calls that fail")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="share of GetFile calls that raise FloodWait")
+    parser.add_argument("--flood-seconds", type=int, default=3, help="value of injected FloodWaits")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,4 @@
+import os
+
+# Backend/__init__ builds the database handle from the environment on import
+os.environ.setdefault("DATABASE", "mongodb://localhost:27017,mongodb://localhost:27018")
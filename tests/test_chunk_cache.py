@@ -0,0 +1,84 @@
+import asyncio
+
+from Backend.helper.chunk_cache import ChunkCache, DiskChunkCache
+
+
+def test_contains_is_not_a_read():
+    cache = ChunkCache(2 * 1024, "lru")
+    cache.put((1, 0), b"a" * 1024)
+    cache.put((1, 1), b"b" * 1024)
+
+    assert cache.contains((1, 0))
+    assert not cache.contains((1, 2))
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    # (1, 0) is still the least recently used entry
+    cache.put((1, 2), b"c" * 1024)
+    assert not cache.contains((1, 0))
+    assert cache.contains((1, 1))
+
+
+def test_disk_contains_is_not_a_read(tmp_path):
+    cache = DiskChunkCache(str(tmp_path), 1024 * 1024)
+
+    async def run():
+        await cache.load()
+        await cache.put((1, 0), b"a" * 1024)
+
+    asyncio.run(run())
+    assert cache.contains((1, 0))
+    assert not cache.contains((1, 1))
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_disk_contains_when_disabled(tmp_path):
+    assert not DiskChunkCache(str(tmp_path), 0).contains((1, 0))
+
+
+def test_lfu_evicts_least_frequently_used_then_oldest():
+    cache = ChunkCache(3 * 1024, "lfu")
+    for n in range(3):
+        cache.put((1, n), bytes(1024))
+    cache.get((1, 0))
+    cache.get((1, 0))
+    cache.get((1, 2))
+
+    cache.put((1, 3), bytes(1024))
+    assert not cache.contains((1, 1))
+
+    # (1, 3) has the lowest count left
+    cache.put((1, 4), bytes(1024))
+    assert not cache.contains((1, 3))
+    assert all(cache.contains((1, n)) for n in (0, 2, 4))
+
+
+def test_lfu_matches_a_full_scan():
+    import random
+
+    rng = random.Random(3)
+    cache = ChunkCache(16 * 1024, "lfu")
+    freq, order, sizes = {}, [], {}
+
+    for _ in range(2000):
+        key = (1, rng.randrange(64))
+        if rng.random() < 0.5:
+            if cache.get(key) is not None:
+                freq[key] += 1
+                order.append(key)
+            continue
+        size = rng.choice((512, 1024, 3072))
+        if key in sizes:
+            freq[key] += 1
+        else:
+            freq[key] = 1
+        sizes[key] = size
+        order.append(key)
+        while sum(sizes.values()) > cache.max_bytes:
+            # the reference: lowest count, ties broken by the oldest time the key reached that count
+            def reached(k):
+                return max(i for i, o in enumerate(order) if o == k)
+            victim = min((k for k in sizes if k != key), key=lambda k: (freq[k], reached(k)))
+            del sizes[victim], freq[victim]
+        cache.put(key, bytes(size))
+        assert set(cache._entries) == set(sizes)
+        assert cache.size == sum(sizes.values())
@@ -0,0 +1,74 @@
+import asyncio
+import struct
+
+from Backend.helper.container_index import (
+    CLUSTER_ID, CUES_ID, EBML_MAGIC, SEEK_HEAD_ID, SEEK_HEAD_MAX_BYTES, SEEK_ID, SEEK_ID_ID, SEEK_POSITION_ID,
+    SEGMENT_ID, index_ranges,
+)
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def element_id(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+
+def size(value: int) -> bytes:
+    return b"\x01" + value.to_bytes(7, "big")
+
+
+def element(eid: int, body: bytes) -> bytes:
+    return element_id(eid) + size(len(body)) + body
+
+
+def seek_head(target: int, position: int) -> bytes:
+    seek = element(SEEK_ID_ID, element_id(target)) + element(SEEK_POSITION_ID, position.to_bytes(4, "big"))
+    return element(SEEK_HEAD_ID, element(SEEK_ID, seek))
+
+
+class Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.requested = []
+
+    async def __call__(self, offset: int, length: int) -> bytes:
+        self.requested.append(length)
+        return self.data[offset:offset + length]
+
+
+def mkv(cues_position: int) -> bytes:
+    ebml = element(0x1A45DFA3, b"\x42\x82\x88matroska")
+    segment_start = len(ebml) + len(element_id(SEGMENT_ID)) + len(UNKNOWN_SIZE)
+    head = seek_head(CUES_ID, cues_position)
+    cluster = element(CLUSTER_ID, b"\x00" * 2048)
+    padding = b"\x00" * (cues_position - len(head) - len(cluster))
+    cues = element(CUES_ID, b"\x00" * 100)
+    data = ebml + element_id(SEGMENT_ID) + UNKNOWN_SIZE + head + cluster + padding + cues
+    assert data.startswith(EBML_MAGIC)
+    return data, segment_start + cues_position, len(cues)
+
+
+def test_mkv_cues_found_through_seek_head():
+    data, cues_offset, cues_len = mkv(200 * 1024)
+    ranges = asyncio.run(index_ranges(Reader(data), len(data)))
+    assert ranges == [(cues_offset, cues_offset + cues_len - 1)]
+
+
+def test_oversized_seek_head_is_not_read():
+    data, _, _ = mkv(200 * 1024)
+    ebml_len = len(element(0x1A45DFA3, b"\x42\x82\x88matroska"))
+    seek_head_at = ebml_len + len(element_id(SEGMENT_ID)) + len(UNKNOWN_SIZE)
+    size_at = seek_head_at + len(element_id(SEEK_HEAD_ID))
+    corrupt = data[:size_at] + size(1 << 40) + data[size_at + 8:]
+
+    reader = Reader(corrupt)
+    assert asyncio.run(index_ranges(reader, len(corrupt))) == []
+    assert max(reader.requested) <= SEEK_HEAD_MAX_BYTES
+
+
+def test_mp4_moov_range():
+    ftyp = struct.pack(">I4s", 16, b"ftyp") + b"isom\x00\x00\x00\x00"
+    mdat = struct.pack(">I4s", 1000, b"mdat") + b"\x00" * 992
+    moov = struct.pack(">I4s", 500, b"moov") + b"\x00" * 492
+    data = ftyp + mdat + moov
+    assert asyncio.run(index_ranges(Reader(data), len(data))) == [(1016, 1515)]
@@ -0,0 +1,61 @@
+from Backend.helper.metrics import MetricsRegistry
+
+
+def render_sample() -> str:
+    registry = MetricsRegistry()
+    served = registry.counter("bytes_served_total", "Bytes written")
+    served.inc(1024)
+    served.inc(512)
+    errors = registry.counter("errors_total", "Errors by path", ("path",))
+    errors.labels('a"b\\c\nd').inc()
+    errors.labels("plain").inc(2)
+    registry.gauge("queue_depth", "Waiting requests").set_function(lambda: 7)
+    latency = registry.histogram("latency_seconds", "Request latency", buckets=(0.1, 1.0, 5.0))
+    for value in (0.05, 0.1, 0.5, 2.0, 30.0):
+        latency.observe(value)
+    return registry.render()
+
+
+def test_help_and_type_lines():
+    lines = render_sample().splitlines()
+    for name, kind, help_text in (
+        ("bytes_served_total", "counter", "Bytes written"),
+        ("errors_total", "counter", "Errors by path"),
+        ("queue_depth", "gauge", "Waiting requests"),
+        ("latency_seconds", "histogram", "Request latency"),
+    ):
+        index = lines.index(f"# HELP {name} {help_text}")
+        assert lines[index + 1] == f"# TYPE {name} {kind}"
+
+
+def test_counter_and_gauge_samples():
+    lines = render_sample().splitlines()
+    assert "bytes_served_total 1536" in lines
+    assert 'errors_total{path="plain"} 2' in lines
+    assert "queue_depth 7" in lines
+
+
+def test_label_values_are_escaped():
+    lines = render_sample().splitlines()
+    assert 'errors_total{path="a\\"b\\\\c\\nd"} 1' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    lines = render_sample().splitlines()
+    buckets = [line for line in lines if line.startswith("latency_seconds_bucket")]
+    assert buckets == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="5"} 4',
+        'latency_seconds_bucket{le="+Inf"} 5',
+    ]
+    assert "latency_seconds_sum 32.65" in lines
+    assert "latency_seconds_count 5" in lines
+    count = next(line for line in lines if line.startswith("latency_seconds_count"))
+    assert buckets[-1].rsplit(" ", 1)[1] == count.rsplit(" ", 1)[1]
+
+
+def test_render_ends_with_newline():
+    text = render_sample()
+    assert text.endswith("\n")
+    assert not text.endswith("\n\n")
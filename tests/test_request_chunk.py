@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from Backend.helper.chunk_cache import chunk_cache
+from Backend.helper.client_health import client_health
+from Backend.helper.custom_dl import ByteStreamer
+from Backend.helper.exceptions import CoalescedFetchFailed
+
+
+class FloodedSession:
+    dc_id = 4
+
+    async def send(self, query):
+        await asyncio.sleep(0.05)
+        raise FloodWait(value=30)
+
+
+class HealthySession:
+    dc_id = 4
+
+    async def send(self, query):
+        return SimpleNamespace(bytes=b"x" * query.limit)
+
+
+def streamer() -> ByteStreamer:
+    return ByteStreamer.__new__(ByteStreamer)
+
+
+def test_waiter_does_not_inherit_another_clients_failure(monkeypatch):
+    monkeypatch.setattr(client_health, "flood_waits", {})
+    chunk_cache.clear()
+    key = (7, 0)
+
+    async def run():
+        owner = asyncio.create_task(
+            streamer()._request_chunk(FloodedSession(), None, key, 0, 4096, 101)
+        )
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(
+            streamer()._request_chunk(HealthySession(), None, key, 0, 4096, 102)
+        )
+        return await asyncio.gather(owner, waiter, return_exceptions=True)
+
+    owner_error, waiter_error = asyncio.run(run())
+    assert isinstance(owner_error, FloodWait)
+    assert isinstance(waiter_error, CoalescedFetchFailed)
+    assert isinstance(waiter_error.error, FloodWait)
+    assert client_health.in_cooldown(101)
+    assert not client_health.in_cooldown(102)
+
+
+def test_owner_sees_its_own_failure():
+    chunk_cache.clear()
+
+    async def run():
+        return await streamer()._request_chunk(FloodedSession(), None, (7, 1), 0, 4096, 103)
+
+    with pytest.raises(FloodWait):
+        asyncio.run(run())
+
+
+def test_disk_cache_writes_are_held_until_done(monkeypatch, tmp_path):
+    from Backend.helper import custom_dl
+    from Backend.helper.chunk_cache import DiskChunkCache
+
+    disk = DiskChunkCache(str(tmp_path), 1024 * 1024 * 1024)
+    monkeypatch.setattr(custom_dl, "disk_chunk_cache", disk)
+    chunk_cache.clear()
+
+    async def run():
+        await disk.load()
+        await streamer()._request_chunk(HealthySession(), None, (8, 0), 0, ByteStreamer.CHUNK_SIZE, 104)
+        assert len(custom_dl.BACKGROUND_TASKS) == 1
+        await asyncio.gather(*custom_dl.BACKGROUND_TASKS)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert custom_dl.BACKGROUND_TASKS == set()
+    assert disk.contains((8, 0))
+
+
+def test_background_failures_are_logged(monkeypatch):
+    from Backend.helper import custom_dl
+
+    logged = []
+    monkeypatch.setattr(custom_dl.LOGGER, "warning", lambda message, *args: logged.append(message))
+
+    async def broken():
+        raise OSError("disk full")
+
+    async def run():
+        task = custom_dl._background(broken(), "disk cache write")
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert custom_dl.BACKGROUND_TASKS == set()
+    assert logged and "disk full" in logged[0]
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+
+from Backend.fastapi.routes import stream_routes
+from Backend.helper.signed_url import verify_stream_query
+
+TOKEN = "tok"
+ENCODED = "ENC"
+
+
+def fake_file_id():
+    return SimpleNamespace(
+        dc_id=4, file_size=1234, unique_id="abcdefgh", file_name="Some.Movie.mkv", mime_type="video/x-matroska",
+    )
+
+
+class FakeStreamer:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def get_file_properties(self, chat_id, message_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return fake_file_id()
+
+
+def install(monkeypatch, streamer):
+    async def decode_string(encoded):
+        return {"chat_id": 1, "msg_id": 2}
+
+    monkeypatch.setattr(stream_routes, "decode_string", decode_string)
+    monkeypatch.setattr(stream_routes, "get_streamer", lambda client: streamer)
+
+
+def test_signed_query_verifies(monkeypatch):
+    install(monkeypatch, FakeStreamer())
+    query = asyncio.run(stream_routes.signed_stream_query(TOKEN, ENCODED))
+    params = dict(parse_qsl(query))
+    info = verify_stream_query(TOKEN, ENCODED, params)
+    assert info["file_name"] == "Some.Movie.mkv"
+    assert info["mime_type"] == "video/x-matroska"
+    assert verify_stream_query("other", ENCODED, params) is None
+
+
+def test_slow_lookup_falls_back_to_unsigned(monkeypatch):
+    install(monkeypatch, FakeStreamer(delay=10))
+    monkeypatch.setattr(stream_routes, "SIGN_TIMEOUT", 0.05)
+    assert asyncio.run(stream_routes.signed_stream_query(TOKEN, ENCODED)) == ""
+
+
+def test_listing_lookups_are_capped(monkeypatch):
+    streamer = FakeStreamer(delay=0.05)
+    install(monkeypatch, streamer)
+    active = {"now": 0, "peak": 0}
+    original = streamer.get_file_properties
+
+    async def tracked(chat_id, message_id):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        try:
+            return await original(chat_id, message_id)
+        finally:
+            active["now"] -= 1
+
+    streamer.get_file_properties = tracked
+
+    async def run():
+        monkeypatch.setattr(stream_routes, "_sign_slots", asyncio.Semaphore(2))
+        return await asyncio.gather(*(stream_routes.signed_stream_query(TOKEN, ENCODED) for _ in range(6)))
+
+    assert all(asyncio.run(run()))
+    assert active["peak"] == 2
@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from Backend.fastapi.routes import stream_routes
+from Backend.fastapi.security.tokens import verify_token
+from Backend.helper import custom_dl
+from Backend.helper.custom_dl import ByteStreamer
+from Backend.helper.file_id_store import file_id_store
+from Backend.helper.session_pool import MediaSessionPool
+from Backend.pyrofork import bot
+
+SIZE = 3 * 1024 * 1024 + 4321
+DATA = (bytes(range(256)) * (SIZE // 256 + 1))[:SIZE]
+DC_ID = 4
+TOKEN = "tok"
+ENCODED = "ENC"
+# what Stremio puts in the path, whatever the file is called
+URL = f"/dl/{TOKEN}/{ENCODED}/video.mkv"
+
+# headers that describe the body, everything else may differ between HEAD and GET
+COMPARED = (
+    "content-type", "content-length", "content-disposition", "content-range",
+    "accept-ranges", "etag", "cache-control",
+)
+
+
+class FakeClient:
+    name = "bot"
+
+
+class FakeSession:
+    dc_id = DC_ID
+
+    def __init__(self):
+        self.is_started = asyncio.Event()
+        self.is_started.set()
+
+    async def send(self, query):
+        return SimpleNamespace(bytes=DATA[query.offset:query.offset + query.limit])
+
+
+def fake_file_id(file_name: str, mime_type: str):
+    return SimpleNamespace(
+        media_id=42, dc_id=DC_ID, local_id=None, chat_id=None, file_size=SIZE,
+        unique_id="abcdefgh", file_name=file_name, mime_type=mime_type, message_ref=(None, 2),
+    )
+
+
+def fake_streamer(file_id) -> ByteStreamer:
+    streamer = ByteStreamer.__new__(ByteStreamer)
+    streamer.client = SimpleNamespace(media_sessions={})
+    streamer._session_lock = asyncio.Lock()
+    streamer._session_pools = {}
+
+    async def new_session(dc_id):
+        return FakeSession()
+
+    async def get_session_pool(dc_id):
+        if dc_id not in streamer._session_pools:
+            pool = MediaSessionPool(dc_id, new_session, 1)
+            pool.add(FakeSession(), primary=True)
+            streamer._session_pools[dc_id] = pool
+        return streamer._session_pools[dc_id]
+
+    async def get_location(file_id):
+        return None
+
+    async def get_file_properties(chat_id, message_id):
+        return file_id
+
+    streamer._get_session_pool = get_session_pool
+    streamer._get_location = get_location
+    streamer.get_file_properties = get_file_properties
+    streamer.peek_file_id = lambda chat_id, msg_id: file_id
+    return streamer
+
+
+@pytest.fixture(params=[("Some.Movie.2024.mkv", "video/x-matroska"), ("", "")], ids=["named", "unnamed"])
+def app(request, monkeypatch):
+    file_id = fake_file_id(*request.param)
+    client = FakeClient()
+
+    async def decode_string(encoded):
+        return {"chat_id": 1, "msg_id": 2}
+
+    async def get_messages(chat_id, msg_id):
+        return SimpleNamespace(video=SimpleNamespace(file_unique_id=file_id.unique_id), document=None)
+
+    client.get_messages = get_messages
+    monkeypatch.setattr(stream_routes, "decode_string", decode_string)
+    monkeypatch.setattr(stream_routes, "StreamBot", client)
+    # shared with the streamer and the admission queue, so filled in place
+    monkeypatch.setitem(bot.multi_clients, 0, client)
+    monkeypatch.setitem(bot.work_loads, 0, 0)
+    monkeypatch.setitem(bot.client_dc_map, 0, DC_ID)
+    monkeypatch.setattr(stream_routes, "_streamer_by_client", {client: fake_streamer(file_id)})
+
+    app = FastAPI()
+    app.include_router(stream_routes.router)
+    app.dependency_overrides[verify_token] = lambda: {}
+    return app
+
+
+async def head_and_get(app, url: str, headers: dict):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        head = await client.head(url, headers=headers)
+        get = await client.get(url, headers=headers)
+    return head, get
+
+
+def compared(response) -> dict:
+    return {name: response.headers.get(name) for name in COMPARED}
+
+
+@pytest.mark.parametrize("signed", [False, True], ids=["unsigned", "signed"])
+@pytest.mark.parametrize("range_header", [None, "bytes=1048570-1048600", "bytes=-100"], ids=["full", "range", "suffix"])
+def test_head_matches_get(app, signed, range_header):
+    async def run():
+        url = URL
+        if signed:
+            query = await stream_routes.signed_stream_query(TOKEN, ENCODED)
+            assert query
+            url = f"{URL}?{query}"
+        headers = {"Range": range_header} if range_header else {}
+        return await head_and_get(app, url, headers)
+
+    head, get = asyncio.run(run())
+    assert head.status_code == get.status_code
+    assert compared(head) == compared(get)
+    assert int(get.headers["content-length"]) == len(get.content)
+    assert 'filename="video.mkv"' not in head.headers["content-disposition"]
+
+
+def test_head_does_not_start_a_streamer(app, monkeypatch):
+    streamers = {}
+    file_id = fake_file_id("Some.Movie.2024.mkv", "video/x-matroska")
+
+    async def get_file_ids(client, chat_id, msg_id):
+        return file_id
+
+    monkeypatch.setattr(stream_routes, "_streamer_by_client", streamers)
+    monkeypatch.setattr(custom_dl, "get_file_ids", get_file_ids)
+    monkeypatch.setattr(file_id_store, "path", "")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.head(URL)
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(SIZE)
+    assert streamers == {}
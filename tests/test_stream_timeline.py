@@ -0,0 +1,27 @@
+import secrets
+
+from Backend.helper.stream_timeline import TimelineStore
+
+
+def test_parts_of_a_multi_range_response_are_sampled_together():
+    store = TimelineStore(0.5)
+    for _ in range(200):
+        parent = secrets.token_hex(8)
+        kept = [store.start(f"{parent}-{n}", 0.0) is not None for n in range(3)]
+        assert len(set(kept)) == 1
+
+
+def test_parts_are_found_by_parent_id():
+    store = TimelineStore(0.0)
+    for n in range(3):
+        store.start(f"abc-{n}", 0.0, forced=True)
+    store.start("abcd-0", 0.0, forced=True)
+
+    assert store.get("abc") is None
+    assert [timeline.stream_id for timeline in store.parts("abc")] == ["abc-0", "abc-1", "abc-2"]
+    assert store.parts("nope") == []
+
+
+def test_sample_rate_bounds():
+    assert TimelineStore(0.0).start("a", 0.0) is None
+    assert TimelineStore(1.0).start("a", 0.0) is not None
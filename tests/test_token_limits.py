@@ -0,0 +1,29 @@
+import pytest
+
+from Backend.helper.exceptions import StreamLimitExceeded
+from Backend.helper.token_limits import TokenLimiter
+
+TOKEN = "3f9c2a7be41d5e60"
+
+
+def test_stats_never_show_the_token():
+    limiter = TokenLimiter()
+    limiter.open(TOKEN, {"max_streams": 2, "max_mbps": 8}, "living room")
+    limiter.open("a1b2c3d4e5f6a7b8", {}, None)
+
+    stats = limiter.stats()
+    assert TOKEN[:4] not in repr(stats)
+    assert sorted(entry["name"] for entry in stats["tokens"]) == ["living room", "unnamed"]
+    entry = next(entry for entry in stats["tokens"] if entry["name"] == "living room")
+    assert entry["streams"] == 1
+    assert entry["max_mbps"] == 8
+
+
+def test_stream_cap_and_close():
+    limiter = TokenLimiter()
+    limiter.open(TOKEN, {"max_streams": 1}, "tv")
+    with pytest.raises(StreamLimitExceeded):
+        limiter.open(TOKEN, {"max_streams": 1}, "tv")
+    limiter.close(TOKEN)
+    assert limiter.stats()["tokens"] == []
+    assert limiter.names == {}